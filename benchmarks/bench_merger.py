@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmarks for the merger against the local fake Spotify API
+(scripts/fake_spotify.py). Times getLikedSongDetails,
+getPlaylistItemsDetailed, find_missing_songs, the streaming fetch-and-diff,
+addSongsToPlaylist and putting new songs at the top of a playlist (position
+inserts vs. a full rebuild) for each library size and reports throughput and
+request counts. With --baseline the
+results are compared to an earlier --save-baseline run and regressions make
+the script exit non-zero.
+
+    python benchmarks/bench_merger.py --sizes 1000,10000 --latency-ms 20
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.fake_spotify import FakeLibrary, FakeSpotifyServer, spotify_id
+import scripts.spotify_utils as su
+import scripts.liked_songs_merger as merger
+
+TOKEN = 'bench-token'
+
+
+def timed(func, *args, **kwargs):
+    """Run func with stdout captured (progress bars) and return (result, seconds)."""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def run_size(size, args):
+    """Run every benchmark against a fresh fake library of `size` liked songs."""
+    library = FakeLibrary(size, (size // 2,), seed=size)
+    server = FakeSpotifyServer(library, latency_ms=args.latency_ms,
+                               rate_429=args.rate_429, rate_5xx=args.rate_5xx).start()
+    su.API_BASE_URL = server.base_url
+    su.configure_session(pool_size=max(args.workers, 1) + 2)
+    su.configure_scheduler(max_rps=args.max_rps)
+    results = []
+
+    def record(name, seconds, items):
+        results.append({
+            'name': name, 'size': size, 'seconds': round(seconds, 4),
+            'items_per_sec': round(items / seconds, 1) if seconds else None,
+            'requests': server.stats['requests'],
+        })
+        server.stats.update({'requests': 0, 'errors_429': 0, 'errors_5xx': 0})
+
+    try:
+        liked, seconds = timed(su.getLikedSongDetails, TOKEN, workers=args.workers)
+        assert len(liked) == size, f"expected {size} liked songs, got {len(liked)}"
+        record('getLikedSongDetails', seconds, len(liked))
+
+        playlist_id = next(iter(library.playlists))
+        target, seconds = timed(su.getPlaylistItemsDetailed, TOKEN, playlist_id, workers=args.workers)
+        record('getPlaylistItemsDetailed', seconds, len(target))
+
+        liked.sort(key=lambda x: x['added_at'])
+        missing, seconds = timed(merger.find_missing_songs, liked, target)
+        record('find_missing_songs', seconds, len(liked) + len(target))
+
+        # Fetch + diff in one pass: target identities only, liked songs streamed past them
+        streamed, seconds = timed(lambda: list(merger.iter_missing_songs(
+            su.iterLikedSongs(TOKEN, workers=args.workers),
+            merger.get_target_identities(TOKEN, playlist_id))))
+        assert len(streamed) == len(missing), "streaming diff disagrees with find_missing_songs"
+        record('iter_missing_songs', seconds, size + len(target))
+
+        empty_id = spotify_id(size, 'bench')
+        library.add_playlist(empty_id, 'Benchmark target')
+        uris = [song['uri'] for song in reversed(missing)]
+        ok, seconds = timed(su.addSongsToPlaylist, TOKEN, empty_id, uris)
+        assert ok, "addSongsToPlaylist failed"
+        record('addSongsToPlaylist', seconds, len(uris))
+
+        # The newest liked songs into a playlist already holding the rest newest first:
+        # inserting at the top (one request per 100 new songs) vs. rebuilding the playlist
+        newest = [song['uri'] for song in reversed(liked)]
+        fresh = max(1, size // 20)
+        stamp = library._stamp(int(time.time()))
+        for name, offset in (('prepend (position)', 1), ('prepend (rebuild)', 2)):
+            prepend_id = spotify_id(size + offset, 'bench')
+            library.add_playlist(prepend_id, name, [(library.index_of(uri), stamp) for uri in newest[fresh:]])
+            if offset == 1:
+                ok, seconds = timed(su.addSongsToPlaylist, TOKEN, prepend_id, newest[:fresh], position=0)
+            else:
+                ok, seconds = timed(lambda: su.removeSongsAtPositions(TOKEN, prepend_id, list(enumerate(newest[fresh:])))
+                                    and su.addSongsToPlaylist(TOKEN, prepend_id, newest))
+            assert ok, f"{name} failed"
+            assert [library.tracks[i][0] for i, _ in library.playlists[prepend_id]['items']] == \
+                [uri.split(':')[-1] for uri in newest], f"{name} left the playlist out of order"
+            record(name, seconds, fresh)
+    finally:
+        server.stop()
+    return results
+
+
+def compare(results, baseline, tolerance, min_delta=0.005):
+    """Return the results that are more than `tolerance` slower than the baseline.
+
+    Differences below `min_delta` seconds are treated as noise.
+    """
+    regressions = []
+    for r in results:
+        key = f"{r['name']}@{r['size']}"
+        if key not in baseline or r['seconds'] - baseline[key] < min_delta:
+            continue
+        if r['seconds'] > baseline[key] * (1 + tolerance):
+            regressions.append((key, baseline[key], r['seconds']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the merger against a local fake Spotify API')
+    parser.add_argument('--sizes', default='1000,10000', help='comma separated liked-library sizes')
+    parser.add_argument('--workers', type=int, default=8, help='page fetch workers (1 = sequential)')
+    parser.add_argument('--latency-ms', type=float, default=20, help='simulated latency per request')
+    parser.add_argument('--rate-429', type=float, default=0, help='fraction of requests answered with 429')
+    parser.add_argument('--rate-5xx', type=float, default=0, help='fraction of reads answered with 503')
+    parser.add_argument('--max-rps', type=float, default=0, help='client rate limit (0 = unlimited)')
+    parser.add_argument('--baseline', help='JSON file from --save-baseline to compare against')
+    parser.add_argument('--save-baseline', help='write the results as a baseline JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown vs. baseline (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    results = []
+    for size in [int(s) for s in args.sizes.split(',') if s]:
+        results.extend(run_size(size, args))
+
+    print(f"{'benchmark':28} {'size':>8} {'seconds':>9} {'items/s':>11} {'requests':>9}")
+    print("-" * 69)
+    for r in results:
+        print(f"{r['name']:28} {r['size']:8d} {r['seconds']:9.3f} {r['items_per_sec'] or 0:11.1f} {r['requests']:9d}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump({f"{r['name']}@{r['size']}": r['seconds'] for r in results}, f, indent=2)
+        print(f"\nBaseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for key, before, after in regressions:
+                print(f"  {key}: {before:.3f}s -> {after:.3f}s ({after / before - 1:+.0%})")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.tolerance:.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,11 +2,131 @@
 import sys
 from scripts.liked_songs_merger import main as merger_main
 
+
+def get_flag_value(flag, default=None):
+    """Return the command line argument following `flag`, or `default`."""
+    if flag in sys.argv:
+        idx = sys.argv.index(flag)
+        if idx + 1 < len(sys.argv):
+            return sys.argv[idx + 1]
+    return default
+
+
 if __name__ == '__main__':
     # Unified entry point: run the merger as described in the README
     quiet_flag = '--quiet'
     quiet = quiet_flag in sys.argv
-    
+
     flag_use_default_playlist = '--default'
     use_default_playlist = flag_use_default_playlist in sys.argv
-    merger_main(quiet=quiet, default_playlist=use_default_playlist)
\ No newline at end of file
+
+    # Ignore the local liked-songs store and download the whole library again
+    flag_full_sync = '--full-sync'
+    full_sync = flag_full_sync in sys.argv
+
+    # Many-to-one merge: --merge liked,<playlist id>,... [--target <id>] [--order added_at|round_robin|priority]
+    merge_sources = get_flag_value('--merge')
+
+    # Fan-out: sync Liked Songs into every target in a config file (default targets.json)
+    flag_fanout = '--fanout'
+    fanout = flag_fanout in sys.argv
+
+    # Watch mode: --watch [config] [--interval seconds] [--jitter fraction] [--budget requests/hour]
+    flag_watch = '--watch'
+    watch = flag_watch in sys.argv
+
+    # Batch mode: --batch [accounts.json] [--workers n] [--budget requests/hour] [--login] [--report file]
+    flag_batch = '--batch'
+    batch = flag_batch in sys.argv
+
+    # Crawl every editable playlist into the local track index: --crawl
+    # Offline queries on that index: --index contains <track> | orphans | subsets | stats
+    crawl = '--crawl' in sys.argv
+    index_query = get_flag_value('--index')
+
+    # Duplicate cleanup: --dedupe [playlist id] [--dry-run] [--identity] [--yes]
+    flag_dedupe = '--dedupe'
+    dedupe = flag_dedupe in sys.argv
+
+    # Plan / apply: --plan [file] [--default] writes the diff to a plan file, --apply [file] [--yes] sends it
+    flag_plan = '--plan'
+    flag_apply = '--apply'
+    plan = flag_plan in sys.argv
+    apply = flag_apply in sys.argv
+
+    # Mirror mode: --mirror [playlist id] [--dry-run] [--yes]
+    flag_mirror = '--mirror'
+    mirror = flag_mirror in sys.argv
+
+    if plan or apply:
+        from scripts import merge_plan
+        plan_path = get_flag_value(flag_plan if plan else flag_apply)
+        if not plan_path or plan_path.startswith('--'):
+            plan_path = merge_plan.PLAN_FILE
+        if plan:
+            merge_plan.plan_main(plan_path, quiet=quiet, default_playlist=use_default_playlist, full_sync=full_sync)
+        else:
+            merge_plan.apply_main(plan_path, quiet=quiet, assume_yes='--yes' in sys.argv)
+    elif mirror:
+        from scripts.mirror import main as mirror_main
+        playlist_id = get_flag_value(flag_mirror)
+        if playlist_id and playlist_id.startswith('--'):
+            playlist_id = None
+        mirror_main(playlist_id, dry_run='--dry-run' in sys.argv, quiet=quiet, assume_yes='--yes' in sys.argv,
+                    full_sync=full_sync)
+    elif dedupe:
+        from scripts.dedupe import main as dedupe_main
+        playlist_id = get_flag_value(flag_dedupe)
+        if playlist_id and playlist_id.startswith('--'):
+            playlist_id = None
+        dedupe_main(playlist_id, dry_run='--dry-run' in sys.argv, by_identity='--identity' in sys.argv,
+                    quiet=quiet, assume_yes='--yes' in sys.argv)
+    elif crawl or index_query:
+        from scripts.playlist_index import main as index_main
+        if crawl:
+            index_main(quiet=quiet, full_sync=full_sync)
+        else:
+            index_main(index_query, get_flag_value(index_query))
+    elif batch:
+        from scripts import batch as batch_runner
+        config_path = get_flag_value(flag_batch)
+        if not config_path or config_path.startswith('--'):
+            config_path = batch_runner.ACCOUNTS_FILE
+        budget = get_flag_value('--budget')
+        batch_runner.main(
+            config_path,
+            workers=int(get_flag_value('--workers', batch_runner.BATCH_WORKERS)),
+            hourly_budget=int(budget) if budget else None,
+            login='--login' in sys.argv,
+            full_sync=full_sync,
+            report_path=get_flag_value('--report'),
+        )
+    elif watch:
+        from scripts import watch as watcher
+        config_path = get_flag_value(flag_watch)
+        if config_path and config_path.startswith('--'):
+            config_path = None
+        watcher.main(
+            config_path,
+            interval=float(get_flag_value('--interval', watcher.WATCH_INTERVAL)),
+            jitter=float(get_flag_value('--jitter', watcher.WATCH_JITTER)),
+            hourly_budget=int(get_flag_value('--budget', watcher.WATCH_HOURLY_BUDGET)),
+            quiet=quiet,
+        )
+    elif fanout:
+        from scripts.fanout import main as fanout_main, TARGETS_FILE
+        config_path = get_flag_value(flag_fanout)
+        if not config_path or config_path.startswith('--'):
+            config_path = TARGETS_FILE
+        fanout_main(config_path, quiet=quiet, assume_yes='--yes' in sys.argv, full_sync=full_sync)
+    elif merge_sources:
+        from scripts.merge_engine import main as merge_main
+        merge_main(
+            [s.strip() for s in merge_sources.split(',') if s.strip()],
+            target_id=get_flag_value('--target'),
+            order=get_flag_value('--order', 'added_at'),
+            quiet=quiet,
+            assume_yes='--yes' in sys.argv,
+        )
+    else:
+        merger_main(quiet=quiet, default_playlist=use_default_playlist, full_sync=full_sync)
@@ -0,0 +1,199 @@
+# scripts/batch.py
+
+"""
+Multi-account batch runner
+Runs the fan-out sync for many Spotify accounts at once. Every account has
+its own token file, local library database and targets; all accounts share
+one request scheduler, so the rate limit and hourly budget hold for the
+whole batch rather than per account.
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Any
+
+from .spotify_utils import *
+from .colors import *
+from . import localServer
+from .progress import set_bars_enabled
+from .library_store import LibraryStore
+from .playlist_cache import PlaylistCache
+from .liked_songs_merger import get_liked_songs_ordered
+from .fanout import load_targets, resolve_targets, resume_targets, plan_fanout, write_fanout
+
+ACCOUNTS_FILE = os.getenv('SPOTIFY_ACCOUNTS_FILE', 'accounts.json')
+
+# Where per-account token files and library databases go unless a profile sets them
+ACCOUNTS_DIR = os.getenv('SPOTIFY_ACCOUNTS_DIR', str(Path.home() / '.spotify_accounts'))
+
+# Number of accounts synced at the same time
+BATCH_WORKERS = int(os.getenv('SPOTIFY_BATCH_WORKERS', 4))
+
+
+def load_accounts(path: str = ACCOUNTS_FILE) -> List[Dict[str, Any]]:
+    """Load account profiles from a JSON config file.
+
+    Expected format (see accounts.example.json):
+        {"accounts": [{"name": "...", "targets": [...]}, ...]}
+
+    Each account needs a unique `name` and either `targets` (fan-out
+    format) or `targets_file`. `token_file` and `library_db` default to
+    files under ACCOUNTS_DIR/<name>/.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    accounts = config.get('accounts', [])
+    names = set()
+    for account in accounts:
+        name = account.get('name')
+        if not name:
+            raise ValueError(f"Account without name in {path}: {account}")
+        if name in names:
+            raise ValueError(f"Duplicate account name '{name}' in {path}")
+        names.add(name)
+        if 'targets' not in account and 'targets_file' not in account:
+            raise ValueError(f"Account '{name}' has neither targets nor targets_file")
+        directory = os.path.join(ACCOUNTS_DIR, name)
+        account['token_file'] = os.path.expanduser(account.get('token_file') or os.path.join(directory, 'tokens.json'))
+        account['library_db'] = os.path.expanduser(account.get('library_db') or os.path.join(directory, 'library.db'))
+    return accounts
+
+
+def login_accounts(accounts: List[Dict[str, Any]]) -> List[str]:
+    """Interactively log in every account that has no usable token, one at a time.
+
+    Returns the names of the accounts that are still not logged in.
+    """
+    failed = []
+    for account in accounts:
+        if get_or_refresh_access_token(interactive=False, token_file=account['token_file']):
+            continue
+        print(f"\n{blue}Log in to Spotify as '{account['name']}'...{clear}")
+        os.makedirs(os.path.dirname(account['token_file']), exist_ok=True)
+        if not get_or_refresh_access_token(interactive=True, token_file=account['token_file'], show_dialog=True):
+            failed.append(account['name'])
+    return failed
+
+
+def sync_account(account: Dict[str, Any], full_sync: bool = False) -> Dict[str, Any]:
+    """Run the fan-out sync for one account and return its summary.
+
+    The summary has 'name', 'status' ('ok', 'partial', 'no_token' or
+    'failed'), 'added', 'targets' ({playlist name: songs added, or None if
+    the write failed}), 'skipped', 'seconds' and 'error'. Nothing is printed
+    and nothing is asked, so accounts can run side by side.
+    """
+    summary = {'name': account['name'], 'status': 'ok', 'added': 0, 'targets': {}, 'skipped': [],
+               'seconds': 0.0, 'error': None}
+    start = time.monotonic()
+    try:
+        configured = account['targets'] if 'targets' in account else load_targets(account['targets_file'])
+        access_token = get_or_refresh_access_token(interactive=False, token_file=account['token_file'])
+        if not access_token:
+            summary['status'] = 'no_token'
+            summary['error'] = "not logged in (run the batch with --login)"
+            return summary
+
+        playlists = getPlaylists(access_token)
+        if not playlists or 'items' not in playlists:
+            raise SpotifyAPIError("Failed to fetch playlists")
+        targets, missing = resolve_targets(playlists['items'], configured)
+        summary['skipped'].extend(missing)
+
+        os.makedirs(os.path.dirname(account['library_db']), exist_ok=True)
+        store = LibraryStore(account['library_db'])
+        cache = PlaylistCache(account['library_db'])
+        try:
+            targets, failed = resume_targets(access_token, targets, cache)
+            summary['skipped'].extend(target['id'] for target in failed)
+            liked_songs = get_liked_songs_ordered(access_token, store, full_sync=full_sync)
+            plans = plan_fanout(access_token, targets, liked_songs, cache)
+            results = write_fanout(access_token, plans, cache)
+        finally:
+            store.close()
+            cache.close()
+
+        for plan in plans:
+            name = plan['playlist']['name']
+            result = results.get(plan['playlist']['id'])
+            if result is None:
+                summary['targets'][name] = 0
+            elif result:
+                summary['targets'][name] = len(plan['songs'])
+                summary['added'] += len(plan['songs'])
+            else:
+                summary['targets'][name] = None
+        if summary['skipped'] or None in summary['targets'].values():
+            summary['status'] = 'partial'
+    except Exception as e:
+        # Whatever goes wrong stays with this account; the rest of the batch carries on
+        summary['status'] = 'failed'
+        summary['error'] = str(e) if isinstance(e, SpotifyAPIError) else f"{type(e).__name__}: {e}"
+    finally:
+        summary['seconds'] = round(time.monotonic() - start, 2)
+    return summary
+
+
+def run_batch(accounts: List[Dict[str, Any]], workers: int = BATCH_WORKERS,
+              full_sync: bool = False) -> List[Dict[str, Any]]:
+    """Sync all accounts on a thread pool; returns the summaries in account order."""
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(sync_account, account, full_sync) for account in accounts]
+        return [future.result() for future in futures]
+
+
+def print_report(summaries: List[Dict[str, Any]]):
+    status_colors = {'ok': darkgreen, 'partial': yellow, 'no_token': yellow, 'failed': red}
+    print(f"\n{green}{'account':20} {'status':9} {'added':>6} {'seconds':>8}  details{clear}")
+    print("-" * 80)
+    for summary in summaries:
+        details = ', '.join(f"{name}: {'failed' if added is None else added}"
+                            for name, added in summary['targets'].items())
+        if summary['skipped']:
+            details = ', '.join(filter(None, [details, f"skipped {len(summary['skipped'])}"]))
+        if summary['error']:
+            details = summary['error']
+        color = status_colors.get(summary['status'], clear)
+        print(f"{summary['name'][:20]:20} {color}{summary['status']:9}{clear} {summary['added']:6d} "
+              f"{summary['seconds']:8.1f}  {details}")
+    added = sum(summary['added'] for summary in summaries)
+    ok = sum(summary['status'] == 'ok' for summary in summaries)
+    print(f"\n{ok}/{len(summaries)} accounts fully synced, {added} songs added")
+
+
+def main(config_path: str = ACCOUNTS_FILE, workers: int = BATCH_WORKERS, max_rps: float = MAX_RPS,
+         hourly_budget: int = None, login: bool = False, full_sync: bool = False, report_path: str = None):
+    """Sync every account in the config file and print a per-account report."""
+    try:
+        accounts = load_accounts(config_path)
+    except (OSError, ValueError) as e:
+        print(f"{red}Failed to load accounts from '{config_path}': {e}{clear}")
+        return
+    if not accounts:
+        print(f"{red}No accounts configured in '{config_path}'{clear}")
+        return
+
+    localServer.set_quiet(True)
+    if login:
+        for name in login_accounts(accounts):
+            print(f"{yellow}'{name}' is still not logged in{clear}")
+
+    # One scheduler for every account, sized for the number of concurrent fetches
+    configure_scheduler(max_rps=max_rps, hourly_budget=hourly_budget)
+    configure_session(pool_size=max(POOL_SIZE, workers * FETCH_WORKERS))
+    set_bars_enabled(False)
+
+    print(f"\n{blue}Syncing {len(accounts)} accounts ({workers} at a time)...{clear}")
+    try:
+        summaries = run_batch(accounts, workers, full_sync)
+    finally:
+        set_bars_enabled(True)
+    print_report(summaries)
+
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(summaries, f, indent=2, ensure_ascii=False)
+        print(f"Report saved to {report_path}")
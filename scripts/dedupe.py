@@ -0,0 +1,129 @@
+# scripts/dedupe.py
+
+"""
+Duplicate cleanup
+Finds tracks that appear more than once in a playlist and removes every
+occurrence after the first, with position-targeted deletes of up to 100
+positions per request against the playlist's snapshot_id.
+"""
+
+from typing import Any, Dict, List
+
+from .spotify_utils import *
+from .colors import *
+from . import localServer
+from .playlist_cache import PlaylistCache
+from .tracks import track_id
+from .track_identity import IdentityIndex
+from .liked_songs_merger import ask_to_proceed, resume_interrupted_write
+
+# Local files can't be removed through the API
+_UNREMOVABLE_PREFIX = 'spotify:local:'
+
+
+def find_duplicates(tracks: List[Track], by_identity: bool = False) -> List[Dict[str, Any]]:
+    """Find the duplicate positions of a playlist in one pass.
+
+    `tracks` is the playlist in order, with None for empty slots (see
+    getPlaylistItemsDetailed(keep_empty=True)), so list indexes are
+    positions. The first occurrence of a track is kept; every later one is
+    returned as {'position', 'track', 'first'} where 'first' is the kept
+    position. With `by_identity`, other releases of the same recording
+    (see track_identity) count as duplicates as well; 'first' is None for
+    those.
+    """
+    first_seen = {}
+    identities = IdentityIndex() if by_identity else None
+    duplicates = []
+    for position, track in enumerate(tracks):
+        if track is None or not track.uri or track.uri.startswith(_UNREMOVABLE_PREFIX):
+            continue
+        key = track_id(track.uri)
+        if key in first_seen:
+            duplicates.append({'position': position, 'track': track, 'first': first_seen[key]})
+            continue
+        if identities is not None and not identities.add_new(track):
+            duplicates.append({'position': position, 'track': track, 'first': None})
+            continue
+        first_seen[key] = position
+    return duplicates
+
+
+def remove_duplicates(access_token: str, playlist_id: str, duplicates: List[Dict[str, Any]], snapshot_id: str):
+    """Delete the duplicate positions. Returns what removeSongsAtPositions returns."""
+    removals = [(dup['position'], dup['track'].uri) for dup in duplicates]
+    return removeSongsAtPositions(access_token, playlist_id, removals, snapshot_id)
+
+
+def print_duplicate_report(duplicates: List[Dict[str, Any]], playlist_name: str):
+    print(f"\n{green}{len(duplicates)} duplicates in '{playlist_name}'{clear}")
+    print("-" * 80)
+    for dup in duplicates:
+        track = dup['track']
+        kept = f"same as #{dup['first'] + 1}" if dup['first'] is not None else "another release of an earlier track"
+        print(f"#{dup['position'] + 1:<5d} {blue}{track.name}{clear} - {cyan}{track.artists}{clear} ({yellow}{kept}{clear})")
+    requests_needed = (len(duplicates) + 99) // 100
+    print(f"\nRemoving them takes {requests_needed} request{'s' if requests_needed != 1 else ''}")
+
+
+def main(playlist_id: str = None, dry_run: bool = False, by_identity: bool = False, quiet: bool = False,
+         assume_yes: bool = False):
+    """Remove duplicate tracks from a playlist (chosen interactively if no id is given)."""
+    localServer.set_quiet(quiet)
+    access_token = get_or_refresh_access_token(interactive=True)
+    if not access_token:
+        print(f"{red}Failed to get access token{clear}")
+        return
+
+    print(f"\n{blue}Fetching your playlists...{clear}")
+    playlists = getPlaylists(access_token)
+    if not playlists or 'items' not in playlists:
+        print(f"{red}No playlists found{clear}")
+        return
+    if playlist_id:
+        playlist = next((pl for pl in playlists['items'] if pl.get('id') == playlist_id), None)
+    else:
+        playlist = selectPlaylistInteractively(playlists)
+    if not playlist:
+        print(f"{red}No writable playlist selected{clear}")
+        return
+
+    cache = PlaylistCache()
+    try:
+        try:
+            if not dry_run and resume_interrupted_write(access_token, playlist, cache) is False:
+                print(f"{red}Failed to resume interrupted write{clear}")
+                return
+            print(f"\n{blue}Fetching '{playlist['name']}'...{clear}")
+            snapshot_id = getPlaylistSnapshot(access_token, playlist['id']).get('snapshot_id')
+            tracks = getPlaylistItemsDetailed(access_token, playlist['id'], keep_empty=True)
+            if getPlaylistSnapshot(access_token, playlist['id']).get('snapshot_id') != snapshot_id:
+                print(f"{red}'{playlist['name']}' changed while it was being read; try again{clear}")
+                return
+        except SpotifyAPIError as e:
+            print(f"{red}{e}{clear}")
+            return
+
+        duplicates = find_duplicates(tracks, by_identity)
+        del tracks
+        if not duplicates:
+            print(f"\n{darkgreen}No duplicates in '{playlist['name']}'!{clear}")
+            return
+        print_duplicate_report(duplicates, playlist['name'])
+        if dry_run:
+            print(f"{yellow}Dry run: nothing was removed{clear}")
+            return
+        print(f"\n{green}Ready to remove {len(duplicates)} songs from '{playlist['name']}'{clear}")
+        if not assume_yes and not ask_to_proceed():
+            print(f"{darkred}Operation cancelled by user{clear}")
+            return
+
+        result = remove_duplicates(access_token, playlist['id'], duplicates, snapshot_id)
+        # Positions shifted: the cached contents are no longer valid either way
+        cache.invalidate(playlist['id'])
+        if result:
+            print(f"{darkgreen}OK:{clear} Removed {len(duplicates)} duplicates from '{cyan}{playlist['name']}{clear}'")
+        else:
+            print(f"{red}Failed to remove duplicates; run again to retry from the playlist's current state{clear}")
+    finally:
+        cache.close()
@@ -0,0 +1,425 @@
+# scripts/fake_spotify.py
+
+"""
+Local stand-in for the Spotify Web API
+Serves /me, /me/playlists, /me/tracks, /playlists/{id} and
+/playlists/{id}/tracks from a synthetic library with Spotify-style paging,
+full-size track objects and `fields` filtering. Latency and 429/5xx
+responses can be injected, either as rates or as "fail the next N requests",
+so the merger can be benchmarked without touching the real API. The random
+5xx rate only hits reads, which the client retries; random 5xx on writes
+(which it must not replay) is a separate opt-in, `rate_5xx_writes`.
+
+Point the client at it with SPOTIFY_API_BASE_URL=http://127.0.0.1:<port>/v1.
+"""
+
+import argparse
+import logging
+import random
+import string
+import threading
+import time
+from typing import Dict, List
+
+from flask import Flask, request, jsonify
+from werkzeug.serving import make_server
+
+USER_ID = 'fake_user'
+
+_WORDS = ('love', 'night', 'fire', 'dream', 'heart', 'summer', 'light', 'blue', 'wild', 'gold',
+          'rain', 'shadow', 'river', 'electric', 'midnight', 'stranger', 'city', 'ocean', 'echo', 'sky')
+_MARKETS = ['AD', 'AE', 'AR', 'AT', 'AU', 'BE', 'BG', 'BO', 'BR', 'CA', 'CH', 'CL', 'CO', 'CR', 'CY',
+            'CZ', 'DE', 'DK', 'DO', 'EC', 'EE', 'ES', 'FI', 'FR', 'GB', 'GR', 'GT', 'HK', 'HN', 'HU',
+            'ID', 'IE', 'IL', 'IS', 'IT', 'JP', 'LI', 'LT', 'LU', 'LV', 'MC', 'MT', 'MX', 'MY', 'NI',
+            'NL', 'NO', 'NZ', 'PA', 'PE', 'PH', 'PL', 'PT', 'PY', 'RO', 'SE', 'SG', 'SK', 'SV', 'TH',
+            'TR', 'TW', 'US', 'UY', 'VN', 'ZA']
+_BASE62 = string.digits + string.ascii_letters
+
+
+def spotify_id(n: int, prefix: str = '') -> str:
+    """Deterministic 22-character base62 id for the n-th object."""
+    chars = []
+    n = n * 2654435761 + len(prefix) * 97
+    for _ in range(22):
+        n, r = divmod(n, 62)
+        chars.append(_BASE62[r])
+        n = n * 31 + r + 7
+    return ''.join(chars)
+
+
+def parse_fields(text: str) -> Dict:
+    """Parse a Spotify `fields` expression such as
+    'items(added_at,track(name,uri,artists(name))),next,total' into a nested
+    dict ({name: sub-spec or None for "everything"})."""
+    pos = 0
+
+    def merge(spec, parts, sub):
+        for part in parts[:-1]:
+            spec = spec.setdefault(part, {})
+            if spec is None:
+                return
+        spec[parts[-1]] = sub
+
+    def parse_list():
+        nonlocal pos
+        spec = {}
+        while pos < len(text):
+            start = pos
+            while pos < len(text) and text[pos] not in ',()':
+                pos += 1
+            name = text[start:pos].strip()
+            sub = None
+            if pos < len(text) and text[pos] == '(':
+                pos += 1
+                sub = parse_list()
+                pos += 1  # closing ')'
+            if name:
+                merge(spec, name.split('.'), sub)
+            if pos < len(text) and text[pos] == ',':
+                pos += 1
+            elif pos < len(text) and text[pos] == ')':
+                break
+        return spec
+
+    return parse_list()
+
+
+def apply_fields(obj, spec):
+    """Keep only the parts of `obj` selected by a parsed fields spec."""
+    if spec is None:
+        return obj
+    if isinstance(obj, list):
+        return [apply_fields(x, spec) for x in obj]
+    if isinstance(obj, dict):
+        return {k: apply_fields(obj[k], sub) for k, sub in spec.items() if k in obj}
+    return obj
+
+
+class FakeLibrary:
+    """Synthetic user library: liked songs (newest first) and playlists."""
+
+    def __init__(self, library_size: int = 1000, playlist_sizes=(500,), seed: int = 0):
+        rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.artists = [f"{rng.choice(_WORDS).title()} {rng.choice(_WORDS).title()}" for _ in range(max(1, library_size // 8))]
+        self.albums = [f"{rng.choice(_WORDS).title()} {rng.choice(_WORDS)}" for _ in range(max(1, library_size // 10))]
+        # Tracks are kept as tuples and expanded to full JSON objects per request
+        self.tracks = []
+        for i in range(library_size):
+            artist_ids = tuple(rng.sample(range(len(self.artists)), k=min(len(self.artists), rng.choice((1, 1, 1, 2, 3)))))
+            name = ' '.join(rng.choice(_WORDS) for _ in range(rng.randint(1, 4))).title()
+            self.tracks.append((spotify_id(i, 't'), name, artist_ids, rng.randrange(len(self.albums)),
+                                rng.randint(90_000, 420_000), f"US{rng.randint(0, 10**10 - 1):010d}"))
+        self.by_uri = {f"spotify:track:{t[0]}": i for i, t in enumerate(self.tracks)}
+        now = int(time.time())
+        # Liked songs: (track index, added_at), newest first
+        self.liked = [(i, self._stamp(now - i * 3600)) for i in range(library_size)]
+        self.playlists = {}
+        for n, size in enumerate(playlist_sizes):
+            members = sorted(rng.sample(range(library_size), k=min(size, library_size)), reverse=True)
+            self.add_playlist(spotify_id(n, 'p'), f"Playlist {n + 1}",
+                              [(i, self._stamp(now - (library_size - i) * 60)) for i in members])
+
+    @staticmethod
+    def _stamp(t: int) -> str:
+        return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(t))
+
+    def add_playlist(self, playlist_id: str, name: str, items: List = None):
+        self.playlists[playlist_id] = {'id': playlist_id, 'name': name, 'version': 1, 'items': list(items or [])}
+
+    def index_of(self, uri: str):
+        return self.by_uri.get(uri)
+
+    def snapshot_id(self, playlist: Dict) -> str:
+        return f"{spotify_id(playlist['version'], playlist['id'])}{playlist['version']:08d}"
+
+    def track_json(self, i: int) -> Dict:
+        track_id, name, artist_ids, album_id, duration_ms, isrc = self.tracks[i]
+        artists = [{
+            'external_urls': {'spotify': f"https://open.spotify.com/artist/{spotify_id(a, 'a')}"},
+            'href': f"https://api.spotify.com/v1/artists/{spotify_id(a, 'a')}",
+            'id': spotify_id(a, 'a'), 'name': self.artists[a], 'type': 'artist',
+            'uri': f"spotify:artist:{spotify_id(a, 'a')}",
+        } for a in artist_ids]
+        album_id_str = spotify_id(album_id, 'al')
+        return {
+            'album': {
+                'album_type': 'album', 'artists': artists[:1], 'available_markets': _MARKETS,
+                'external_urls': {'spotify': f"https://open.spotify.com/album/{album_id_str}"},
+                'href': f"https://api.spotify.com/v1/albums/{album_id_str}", 'id': album_id_str,
+                'images': [{'height': h, 'url': f"https://i.scdn.co/image/{album_id_str}{h}", 'width': h}
+                           for h in (640, 300, 64)],
+                'name': self.albums[album_id], 'release_date': '2019-05-17', 'release_date_precision': 'day',
+                'total_tracks': 12, 'type': 'album', 'uri': f"spotify:album:{album_id_str}",
+            },
+            'artists': artists, 'available_markets': _MARKETS, 'disc_number': 1,
+            'duration_ms': duration_ms, 'explicit': False, 'external_ids': {'isrc': isrc},
+            'external_urls': {'spotify': f"https://open.spotify.com/track/{track_id}"},
+            'href': f"https://api.spotify.com/v1/tracks/{track_id}", 'id': track_id, 'is_local': False,
+            'name': name, 'popularity': 50, 'preview_url': None, 'track_number': 1, 'type': 'track',
+            'uri': f"spotify:track:{track_id}",
+        }
+
+    def playlist_json(self, playlist: Dict) -> Dict:
+        return {
+            'collaborative': False, 'description': '', 'id': playlist['id'], 'name': playlist['name'],
+            'owner': {'id': USER_ID, 'display_name': 'Fake User', 'type': 'user'},
+            'public': False, 'snapshot_id': self.snapshot_id(playlist),
+            'tracks': {'href': f"https://api.spotify.com/v1/playlists/{playlist['id']}/tracks",
+                       'total': len(playlist['items'])},
+            'type': 'playlist', 'uri': f"spotify:playlist:{playlist['id']}",
+        }
+
+
+def create_app(library: FakeLibrary, latency_ms: float = 0, rate_429: float = 0, rate_5xx: float = 0,
+               rate_5xx_writes: float = 0, retry_after: int = 1) -> Flask:
+    """Build the Flask app serving `library`."""
+    app = Flask(__name__)
+    faults = {'latency_ms': latency_ms, 'rate_429': rate_429, 'rate_5xx': rate_5xx,
+              'rate_5xx_writes': rate_5xx_writes, 'retry_after': retry_after, 'next_429': 0, 'next_5xx': 0, 'expired_tokens': []}
+    stats = {'requests': 0, 'errors_401': 0, 'errors_429': 0, 'errors_5xx': 0}
+    fault_lock = threading.Lock()
+    app.config['faults'] = faults
+    app.config['stats'] = stats
+
+    def page(items, total_items, to_json):
+        limit = min(int(request.args.get('limit', 20)), 50 if request.path.endswith('/me/tracks') else 100)
+        offset = int(request.args.get('offset', 0))
+        chunk = items[offset:offset + limit]
+        base = request.base_url
+        body = {
+            'href': f"{base}?offset={offset}&limit={limit}",
+            'items': [to_json(x) for x in chunk],
+            'limit': limit,
+            'next': f"{base}?offset={offset + limit}&limit={limit}" if offset + limit < total_items else None,
+            'offset': offset,
+            'previous': f"{base}?offset={max(0, offset - limit)}&limit={limit}" if offset > 0 else None,
+            'total': total_items,
+        }
+        fields = request.args.get('fields')
+        return apply_fields(body, parse_fields(fields)) if fields else body
+
+    @app.before_request
+    def inject_faults():
+        if request.path.startswith('/_fake'):
+            return None
+        if faults['latency_ms']:
+            time.sleep(faults['latency_ms'] / 1000)
+        token = request.headers.get('Authorization', '').replace('Bearer ', '', 1)
+        with fault_lock:
+            stats['requests'] += 1
+            status = None
+            if token and token in faults['expired_tokens']:
+                stats['errors_401'] += 1
+                status = 401
+            elif faults['next_429'] > 0:
+                faults['next_429'] -= 1
+                status = 429
+            elif faults['next_5xx'] > 0:
+                faults['next_5xx'] -= 1
+                status = 503
+            elif random.random() < faults['rate_429']:
+                status = 429
+            elif random.random() < faults['rate_5xx' if request.method == 'GET' else 'rate_5xx_writes']:
+                status = 503
+            if status == 429:
+                stats['errors_429'] += 1
+            elif status == 503:
+                stats['errors_5xx'] += 1
+        if status is None:
+            return None
+        message = {401: 'The access token expired', 429: 'API rate limit exceeded'}.get(status, 'Service unavailable')
+        resp = jsonify({'error': {'status': status, 'message': message}})
+        resp.status_code = status
+        if status == 429:
+            resp.headers['Retry-After'] = str(faults['retry_after'])
+        return resp
+
+    @app.route('/_fake/faults', methods=['GET', 'POST'])
+    def set_faults():
+        if request.method == 'POST':
+            with fault_lock:
+                faults.update({k: v for k, v in (request.get_json(silent=True) or {}).items() if k in faults})
+        return jsonify(faults)
+
+    @app.route('/_fake/stats', methods=['GET', 'DELETE'])
+    def get_stats():
+        if request.method == 'DELETE':
+            with fault_lock:
+                for key in stats:
+                    stats[key] = 0
+        return jsonify(stats)
+
+    @app.route('/v1/me')
+    def me():
+        return jsonify({'id': USER_ID, 'display_name': 'Fake User', 'type': 'user'})
+
+    @app.route('/v1/me/tracks')
+    def liked_tracks():
+        with library.lock:
+            liked = list(library.liked)
+        return jsonify(page(liked, len(liked), lambda x: {'added_at': x[1], 'track': library.track_json(x[0])}))
+
+    @app.route('/v1/me/playlists')
+    def my_playlists():
+        with library.lock:
+            playlists = [library.playlist_json(pl) for pl in library.playlists.values()]
+        return jsonify(page(playlists, len(playlists), lambda x: x))
+
+    @app.route('/v1/playlists/<playlist_id>')
+    def playlist(playlist_id):
+        with library.lock:
+            pl = library.playlists.get(playlist_id)
+            if pl is None:
+                return jsonify({'error': {'status': 404, 'message': 'Not found'}}), 404
+            body = library.playlist_json(pl)
+        fields = request.args.get('fields')
+        return jsonify(apply_fields(body, parse_fields(fields)) if fields else body)
+
+    @app.route('/v1/playlists/<playlist_id>/tracks', methods=['GET'])
+    def playlist_tracks(playlist_id):
+        with library.lock:
+            pl = library.playlists.get(playlist_id)
+            if pl is None:
+                return jsonify({'error': {'status': 404, 'message': 'Not found'}}), 404
+            items = list(pl['items'])
+        return jsonify(page(items, len(items), lambda x: {
+            'added_at': x[1], 'added_by': {'id': USER_ID}, 'is_local': False, 'track': library.track_json(x[0]),
+        }))
+
+    @app.route('/v1/playlists/<playlist_id>/tracks', methods=['POST'])
+    def add_tracks(playlist_id):
+        body = request.get_json(silent=True) or {}
+        uris = body.get('uris') or []
+        if len(uris) > 100:
+            return jsonify({'error': {'status': 400, 'message': 'Too many ids requested'}}), 400
+        with library.lock:
+            pl = library.playlists.get(playlist_id)
+            if pl is None:
+                return jsonify({'error': {'status': 404, 'message': 'Not found'}}), 404
+            indexes = [library.index_of(uri) for uri in uris]
+            if None in indexes:
+                return jsonify({'error': {'status': 400, 'message': 'Invalid track uri'}}), 400
+            stamp = library._stamp(int(time.time()))
+            position = body.get('position', len(pl['items']))
+            pl['items'][position:position] = [(i, stamp) for i in indexes]
+            pl['version'] += 1
+            snapshot_id = library.snapshot_id(pl)
+        return jsonify({'snapshot_id': snapshot_id}), 201
+
+    @app.route('/v1/playlists/<playlist_id>/tracks', methods=['DELETE'])
+    def remove_tracks(playlist_id):
+        body = request.get_json(silent=True) or {}
+        tracks = body.get('tracks') or []
+        if len(tracks) > 100 or sum(len(t.get('positions') or [None]) for t in tracks) > 100:
+            return jsonify({'error': {'status': 400, 'message': 'Too many tracks requested'}}), 400
+        with library.lock:
+            pl = library.playlists.get(playlist_id)
+            if pl is None:
+                return jsonify({'error': {'status': 404, 'message': 'Not found'}}), 404
+            # Positions are only checked against the current snapshot (Spotify maps older ones)
+            if body.get('snapshot_id') and body['snapshot_id'] != library.snapshot_id(pl):
+                return jsonify({'error': {'status': 400, 'message': 'Snapshot mismatch'}}), 400
+            remove = set()
+            for entry in tracks:
+                index = library.index_of(entry.get('uri'))
+                if index is None:
+                    return jsonify({'error': {'status': 400, 'message': 'Invalid track uri'}}), 400
+                positions = entry.get('positions')
+                if positions is None:
+                    remove.update(p for p, (i, _) in enumerate(pl['items']) if i == index)
+                    continue
+                for position in positions:
+                    if not 0 <= position < len(pl['items']) or pl['items'][position][0] != index:
+                        return jsonify({'error': {'status': 400, 'message': 'Invalid position'}}), 400
+                    remove.add(position)
+            pl['items'] = [item for p, item in enumerate(pl['items']) if p not in remove]
+            pl['version'] += 1
+            snapshot_id = library.snapshot_id(pl)
+        return jsonify({'snapshot_id': snapshot_id})
+
+    @app.route('/v1/playlists/<playlist_id>/tracks', methods=['PUT'])
+    def reorder_tracks(playlist_id):
+        body = request.get_json(silent=True) or {}
+        with library.lock:
+            pl = library.playlists.get(playlist_id)
+            if pl is None:
+                return jsonify({'error': {'status': 404, 'message': 'Not found'}}), 404
+            if body.get('snapshot_id') and body['snapshot_id'] != library.snapshot_id(pl):
+                return jsonify({'error': {'status': 400, 'message': 'Snapshot mismatch'}}), 400
+            items = pl['items']
+            start, length = body.get('range_start'), body.get('range_length', 1)
+            insert_before = body.get('insert_before')
+            if (start is None or insert_before is None or length < 1 or not 0 <= start <= len(items) - length
+                    or not 0 <= insert_before <= len(items)):
+                return jsonify({'error': {'status': 400, 'message': 'Invalid range'}}), 400
+            if not start <= insert_before <= start + length:
+                moved = items[start:start + length]
+                del items[start:start + length]
+                if insert_before > start:
+                    insert_before -= length
+                items[insert_before:insert_before] = moved
+            pl['version'] += 1
+            snapshot_id = library.snapshot_id(pl)
+        return jsonify({'snapshot_id': snapshot_id})
+
+    return app
+
+
+class FakeSpotifyServer:
+    """Runs the fake API on a background thread (port 0 picks a free port)."""
+
+    def __init__(self, library: FakeLibrary = None, host: str = '127.0.0.1', port: int = 0, quiet: bool = True,
+                 **fault_options):
+        if quiet:
+            # Hide werkzeug's per-request log lines
+            logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        self.library = library or FakeLibrary()
+        self.app = create_app(self.library, **fault_options)
+        self.server = make_server(host, port, self.app, threaded=True)
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.server.host}:{self.server.server_port}/v1"
+
+    @property
+    def faults(self) -> Dict:
+        return self.app.config['faults']
+
+    @property
+    def stats(self) -> Dict:
+        return self.app.config['stats']
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        if self.thread is not None:
+            self.thread.join()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local fake Spotify Web API')
+    parser.add_argument('--size', type=int, default=1000, help='number of liked songs')
+    parser.add_argument('--playlists', default='500', help='comma separated playlist sizes')
+    parser.add_argument('--port', type=int, default=8899)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--rate-429', type=float, default=0)
+    parser.add_argument('--rate-5xx', type=float, default=0, help='fraction of reads answered with 503')
+    parser.add_argument('--rate-5xx-writes', type=float, default=0, help='fraction of writes answered with 503')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.playlists.split(',') if s]
+    server = FakeSpotifyServer(FakeLibrary(args.size, sizes, args.seed), port=args.port, quiet=False,
+                               latency_ms=args.latency_ms, rate_429=args.rate_429, rate_5xx=args.rate_5xx,
+                               rate_5xx_writes=args.rate_5xx_writes)
+    print(f"Fake Spotify API on {server.base_url} ({args.size} liked songs, playlists {sizes})")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,233 @@
+# scripts/fanout.py
+
+"""
+Multi-target fan-out
+Syncs Liked Songs into several playlists from a single fetch of the liked
+library. Targets and their filters come from a JSON config file.
+"""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any
+
+from .spotify_utils import *
+from .spotify_async import getManyPlaylistItems
+from .colors import *
+from . import localServer
+from .library_store import LibraryStore
+from .playlist_cache import PlaylistCache
+from .liked_songs_merger import (
+    get_liked_songs_ordered,
+    find_missing_songs,
+    confirm_addition,
+    write_songs,
+    insert_position,
+    resume_interrupted_write,
+    _with_added_now,
+)
+from .merge_engine import SOURCE_WORKERS
+
+TARGETS_FILE = os.getenv('SPOTIFY_TARGETS_FILE', 'targets.json')
+
+
+def load_targets(path: str = TARGETS_FILE) -> List[Dict[str, Any]]:
+    """Load the fan-out targets from a JSON config file.
+
+    Expected format (see targets.example.json):
+        {"targets": [{"playlist_id": "...", "filter": {...}}, ...]}
+
+    Supported filter keys: `added_after` / `added_before` (ISO dates,
+    compared against the song's added_at) and `artists` (list of artist
+    names, each matched case-insensitively against a song's individual
+    artists, so names containing commas work).
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    targets = config.get('targets', [])
+    for target in targets:
+        if not target.get('playlist_id'):
+            raise ValueError(f"Target without playlist_id in {path}: {target}")
+    return targets
+
+
+def song_matches(song: Dict[str, Any], song_filter: Dict[str, Any]) -> bool:
+    """Return True if the song passes a target's filter."""
+    if not song_filter:
+        return True
+    added_at = song.get('added_at', '')
+    if song_filter.get('added_after') and added_at < song_filter['added_after']:
+        return False
+    if song_filter.get('added_before') and added_at >= song_filter['added_before']:
+        return False
+    wanted = song_filter.get('artists')
+    if wanted:
+        # Per-artist names: the joined display string can't be split back apart
+        wanted = {a.strip().casefold() for a in wanted}
+        if not any(a.casefold() in wanted for a in Track.from_dict(song).artist_names):
+            return False
+    return True
+
+
+def resolve_targets(playlists: List[Dict[str, Any]], configured: List[Dict[str, Any]]):
+    """Match configured targets to the user's writable playlists.
+
+    Returns (targets, missing): playlist objects with the target's 'filter'
+    attached, and the configured playlist ids that weren't found.
+    """
+    by_id = {pl['id']: pl for pl in playlists}
+    targets, missing = [], []
+    for entry in configured:
+        playlist = by_id.get(entry['playlist_id'])
+        if playlist is None:
+            missing.append(entry['playlist_id'])
+        else:
+            targets.append(dict(playlist, filter=entry.get('filter')))
+    return targets, missing
+
+
+def resume_targets(access_token: str, targets: List[Dict[str, Any]], cache: PlaylistCache = None):
+    """Finish interrupted writes to the targets before diffing them.
+
+    Returns (ready, failed): targets safe to plan (snapshot ids updated
+    where a resume wrote to them) and targets whose resume failed.
+    """
+    ready, failed = [], []
+    for target in targets:
+        resumed = resume_interrupted_write(access_token, target, cache)
+        if resumed is False:
+            failed.append(target)
+            continue
+        if isinstance(resumed, str):
+            target['snapshot_id'] = resumed
+        ready.append(target)
+    return ready, failed
+
+
+def plan_fanout(access_token: str, targets: List[Dict[str, Any]], liked_songs: List[Dict[str, Any]],
+                cache: PlaylistCache = None, workers: int = SOURCE_WORKERS) -> List[Dict[str, Any]]:
+    """Fetch all targets concurrently and diff each against the shared liked songs.
+
+    `targets` are playlist objects (from getPlaylists) with an extra
+    'filter' key. Returns one {'playlist', 'songs'} entry per target, songs
+    newest first.
+    """
+    target_songs = {}
+    for target in targets:
+        cached = cache.get(target['id'], target.get('snapshot_id')) if cache is not None else None
+        if cached is not None:
+            target_songs[target['id']] = cached
+    fetched = getManyPlaylistItems(access_token, [t['id'] for t in targets if t['id'] not in target_songs],
+                                   workers=workers)
+    target_songs.update(fetched)
+
+    plans = []
+    for target in targets:
+        songs = target_songs[target['id']]
+        if cache is not None and target['id'] in fetched:
+            cache.put(target['id'], target.get('snapshot_id'), songs)
+        candidates = [song for song in liked_songs if song_matches(song, target.get('filter'))]
+        missing = find_missing_songs(candidates, songs)
+        plans.append({'playlist': target, 'songs': list(reversed(missing))})
+    return plans
+
+
+def write_fanout(access_token: str, plans: List[Dict[str, Any]], cache: PlaylistCache = None,
+                 workers: int = SOURCE_WORKERS) -> Dict[str, Any]:
+    """Write every plan concurrently. Returns {playlist_id: addSongsToPlaylist result}.
+
+    Each target gets its own write journal; the cache is updated afterwards
+    on this thread since its SQLite connection can't be shared.
+    """
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {
+            plan['playlist']['id']: pool.submit(write_songs, access_token, plan['playlist'], plan['songs'],
+                                                position=insert_position())
+            for plan in plans if plan['songs']
+        }
+        for playlist_id, future in futures.items():
+            results[playlist_id] = future.result()
+
+    if cache is not None:
+        for plan in plans:
+            playlist = plan['playlist']
+            result = results.get(playlist['id'])
+            if isinstance(result, str):
+                cache.insert(playlist['id'], playlist.get('snapshot_id'), result, _with_added_now(plan['songs']),
+                             insert_position())
+            elif playlist['id'] in results:
+                cache.invalidate(playlist['id'])
+    return results
+
+
+def main(config_path: str = TARGETS_FILE, quiet: bool = False, assume_yes: bool = False, full_sync: bool = False):
+    """Sync Liked Songs into every target listed in the config file."""
+    try:
+        configured = load_targets(config_path)
+    except (OSError, ValueError) as e:
+        print(f"{red}Failed to load targets from '{config_path}': {e}{clear}")
+        return
+    if not configured:
+        print(f"{red}No targets configured in '{config_path}'{clear}")
+        return
+
+    localServer.set_quiet(quiet)
+    access_token = get_or_refresh_access_token(interactive=True)
+    if not access_token:
+        print(f"{red}Failed to get access token{clear}")
+        return
+
+    print(f"\n{blue}Fetching your playlists...{clear}")
+    playlists = getPlaylists(access_token)
+    if not playlists or 'items' not in playlists:
+        print(f"{red}No playlists found{clear}")
+        return
+    targets, missing = resolve_targets(playlists['items'], configured)
+    for playlist_id in missing:
+        print(f"{yellow}Skipping {playlist_id}: not found or not writable{clear}")
+    if not targets:
+        print(f"{red}None of the configured targets are available{clear}")
+        return
+
+    store = LibraryStore()
+    cache = PlaylistCache()
+    try:
+        try:
+            targets, failed = resume_targets(access_token, targets, cache)
+            for target in failed:
+                print(f"{yellow}Skipping '{target['name']}': failed to resume interrupted write{clear}")
+            print(f"\n{blue}Fetching your liked songs...{clear}")
+            liked_songs = get_liked_songs_ordered(access_token, store, full_sync=full_sync)
+            print(f"\n{blue}Fetching {len(targets)} target playlists...{clear}")
+            plans = plan_fanout(access_token, targets, liked_songs, cache)
+        except SpotifyAPIError as e:
+            print(f"{red}{e}{clear}")
+            return
+
+        total = sum(len(plan['songs']) for plan in plans)
+        print(f"\n{green}Fan-out plan:{clear}")
+        for plan in plans:
+            print(f"  {cyan}{plan['playlist']['name']}{clear}: {len(plan['songs'])} songs to add")
+        if not total:
+            print(f"\n{darkgreen}All targets are up to date!{clear}")
+            return
+
+        if not assume_yes and not confirm_addition([song for plan in plans for song in plan['songs']],
+                                                   f"{len(plans)} playlists"):
+            print(f"{darkred}Operation cancelled by user{clear}")
+            return
+
+        print("\nAdding songs to playlists...")
+        results = write_fanout(access_token, plans, cache)
+    finally:
+        store.close()
+        cache.close()
+    for plan in plans:
+        result = results.get(plan['playlist']['id'])
+        if result is None:
+            continue
+        if result:
+            print(f"{darkgreen}OK:{clear} Added {len(plan['songs'])} songs to '{cyan}{plan['playlist']['name']}{clear}'")
+        else:
+            print(f"{red}Failed to add songs to '{plan['playlist']['name']}'{clear}")
@@ -0,0 +1,129 @@
+# scripts/library_store.py
+
+import os
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+from .spotify_utils import API_BASE_URL, SpotifyAPIError, _fetchPage, getLikedSongDetails
+from .tracks import Track, dump_artists, load_artists
+
+# Local copy of the user's Liked Songs, so a run only has to download what was
+# liked since the last one.
+LIBRARY_DB = os.getenv('SPOTIFY_LIBRARY_DB', str(Path.home() / '.spotify_library.db'))
+
+
+def add_missing_columns(conn: sqlite3.Connection, table: str, columns: Dict[str, str]) -> bool:
+    """Add `columns` ({name: type}) that an older database lacks. Returns True if any were added."""
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    missing = [(name, kind) for name, kind in columns.items() if name not in existing]
+    for name, kind in missing:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {kind}")
+    return bool(missing)
+
+
+class LibraryStore:
+    """SQLite-backed store of liked tracks (name, uri, artists, added_at, isrc, duration_ms)."""
+
+    def __init__(self, path: str = LIBRARY_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS liked_tracks ("
+            " uri TEXT PRIMARY KEY, name TEXT, artists TEXT, added_at TEXT, isrc TEXT, duration_ms INTEGER)"
+        )
+        if add_missing_columns(self.conn, 'liked_tracks', {'isrc': 'TEXT', 'duration_ms': 'INTEGER'}):
+            # Rows from before ISRCs were stored: empty the store so the next sync downloads them again
+            self.conn.execute("DELETE FROM liked_tracks")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS liked_added_at ON liked_tracks(added_at)")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM liked_tracks").fetchone()[0]
+
+    def high_water_mark(self) -> str:
+        """Return the newest `added_at` in the store ('' if empty)."""
+        row = self.conn.execute("SELECT MAX(added_at) FROM liked_tracks").fetchone()
+        return row[0] or ''
+
+    def contains(self, uri: str, added_at: str) -> bool:
+        row = self.conn.execute(
+            "SELECT 1 FROM liked_tracks WHERE uri = ? AND added_at = ?", (uri, added_at)
+        ).fetchone()
+        return row is not None
+
+    def iter_liked_songs(self, newest_first: bool = False) -> Iterator[Track]:
+        """Yield the stored liked songs row by row, oldest first unless `newest_first`."""
+        order = "added_at DESC, rowid DESC" if newest_first else "added_at, rowid"
+        rows = self.conn.execute(
+            f"SELECT name, uri, artists, added_at, isrc, duration_ms FROM liked_tracks ORDER BY {order}"
+        )
+        for name, uri, artists, added_at, isrc, duration_ms in rows:
+            yield Track(name, uri, load_artists(artists), added_at, isrc, duration_ms)
+
+    def liked_songs(self) -> List[Track]:
+        """Return all stored liked songs, oldest first."""
+        return list(self.iter_liked_songs())
+
+    def add_liked_songs(self, songs: List[Track]):
+        """Insert songs, updating `added_at` of tracks that were liked again."""
+        self.conn.executemany(
+            "INSERT INTO liked_tracks (uri, name, artists, added_at, isrc, duration_ms) VALUES (?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT(uri) DO UPDATE SET name = excluded.name, artists = excluded.artists,"
+            " added_at = excluded.added_at, isrc = excluded.isrc, duration_ms = excluded.duration_ms",
+            [(s['uri'], s['name'], dump_artists(s), s['added_at'], s.get('isrc'), s.get('duration_ms')) for s in songs],
+        )
+        self.conn.commit()
+
+    def replace_liked_songs(self, songs: List[Track]):
+        """Drop everything and store `songs` as the full library."""
+        self.conn.execute("DELETE FROM liked_tracks")
+        self.add_liked_songs(songs)
+
+
+def sync_liked_songs(access_token: str, store: LibraryStore, full: bool = False) -> int:
+    """Bring the store up to date with the user's Liked Songs.
+
+    /me/tracks is returned newest first, so pages are fetched only until a
+    track the store already has is reached. If the store's size then doesn't
+    match the API's `total` (songs were unliked), or `full` is True, the whole
+    library is downloaded again. Returns the number of new songs found.
+    """
+    if full or store.count() == 0:
+        store.replace_liked_songs(getLikedSongDetails(access_token))
+        return store.count()
+
+    high_water = store.high_water_mark()
+    url = f"{API_BASE_URL}/me/tracks"
+    limit = 50
+    offset = 0
+    total = None
+    new_songs = []
+    reached_known = False
+    while not reached_known:
+        status, data = _fetchPage(access_token, url, offset, limit)
+        if data is None:
+            raise SpotifyAPIError(f"Error fetching liked songs: {status}", status)
+        total = data.get('total', 0)
+        for item in data.get('items', []):
+            track = Track.from_item(item)
+            if track is None:
+                continue
+            if track.added_at <= high_water and store.contains(track.uri, track.added_at):
+                reached_known = True
+                break
+            new_songs.append(track)
+        offset += limit
+        if not data.get('next'):
+            break
+
+    if new_songs:
+        store.add_liked_songs(new_songs)
+    if store.count() != total:
+        # Something was unliked since the last sync; the cheap path can't see
+        # removals, so fall back to a full download.
+        store.replace_liked_songs(getLikedSongDetails(access_token))
+    return len(new_songs)
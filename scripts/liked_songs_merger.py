@@ -8,16 +8,37 @@ Takes songs from user's liked playlist and adds them to a selected playlist
 in reverse chronological order (newest first)
 """
 
-import sys
+import os
 import time
 from datetime import datetime
-from typing import List, Dict, Any
-from .helpful_fuctions import clearTerminal, customProgressBar
+from typing import List, Dict, Any, Iterable, Iterator, Optional
+from .helpful_fuctions import clearTerminal
 from .colors import *
 from . import localServer
+from .library_store import LibraryStore, sync_liked_songs
+from .playlist_cache import PlaylistCache
+from .write_journal import WriteJournal
+from .tracks import Track
+from .track_identity import IdentityIndex
+from .progress import Progress
+
+# Where new liked songs go: 'top' (newest first above the older ones, like Liked Songs) or 'bottom' (appended)
+INSERT_AT = os.getenv('SPOTIFY_INSERT_AT', 'top')
+
+def insert_position() -> Optional[int]:
+    """Playlist position new liked songs are written at (None appends)."""
+    return None if INSERT_AT == 'bottom' else 0
+
+def get_liked_songs_ordered(access_token: str, store: LibraryStore = None, full_sync: bool = False) -> List[Dict[str, Any]]:
+    """Get liked songs ordered by date added (oldest first)
+
+    If a LibraryStore is given it is synced incrementally and the songs are
+    read from it instead of downloading the whole library.
+    """
+    if store is not None:
+        sync_liked_songs(access_token, store, full=full_sync)
+        return store.liked_songs()
 
-def get_liked_songs_ordered(access_token: str) -> List[Dict[str, Any]]:
-    """Get liked songs ordered by date added (oldest first)"""
     liked_songs = getLikedSongDetails(access_token)
     if not liked_songs:
         return []
@@ -26,37 +47,228 @@ def get_liked_songs_ordered(access_token: str) -> List[Dict[str, Any]]:
     liked_songs.sort(key=lambda x: x['added_at'])
     return liked_songs
 
-def get_target_playlist_songs(access_token: str, playlist_id: str) -> List[Dict[str, Any]]:
-    """Get all songs from target playlist"""
-    return getPlaylistItemsDetailed(access_token, playlist_id)
-
-def find_missing_songs(liked_songs: List[Dict], target_songs: List[Dict]) -> List[Dict]:
-    """Find songs in liked but not in target playlist"""
-    target_uris = {song['uri'] for song in target_songs}
-    missing_songs = []
-    
+def get_target_playlist_songs(access_token: str, playlist_id: str, snapshot_id: str = None,
+                              cache: PlaylistCache = None) -> List[Dict[str, Any]]:
+    """Get all songs from target playlist
+
+    With a PlaylistCache and the playlist's current snapshot_id, the cached
+    contents are returned without any request if the playlist hasn't changed.
+    """
+    if cache is not None:
+        cached = cache.get(playlist_id, snapshot_id)
+        if cached is not None:
+            return cached
+    songs = getPlaylistItemsDetailed(access_token, playlist_id)
+    if cache is not None:
+        cache.put(playlist_id, snapshot_id, songs)
+    return songs
+
+def get_target_identities(access_token: str, playlist_id: str, snapshot_id: str = None,
+                          cache: PlaylistCache = None, show_progress: bool = True) -> IdentityIndex:
+    """Get an IdentityIndex of the tracks in the target playlist
+
+    Only the identity hashes are kept in memory. They come from the cache if
+    it holds the playlist at `snapshot_id`; otherwise the playlist is
+    streamed page by page, into the cache if one is given, or requesting
+    only the identity fields if not.
+    """
+    if cache is not None:
+        identities = cache.identities(playlist_id, snapshot_id)
+        if identities is not None:
+            return identities
+    identities = IdentityIndex()
+    with Progress("target playlist", enabled=None if show_progress else False) as progress:
+        if cache is not None and snapshot_id:
+            def collect(songs):
+                for song in songs:
+                    identities.add(song)
+                    yield song
+            cache.put(playlist_id, snapshot_id, collect(iterPlaylistItems(access_token, playlist_id, progress=progress)))
+        else:
+            songs = iterPlaylistItems(access_token, playlist_id, fields=TRACK_IDENTITY_FIELDS, progress=progress)
+            identities.update(songs)
+    return identities
+
+def iter_missing_songs(liked_songs: Iterable[Track], target: IdentityIndex) -> Iterator[Track]:
+    """Yield the liked songs with no equivalent in `target`, in the order they are read
+
+    Equivalent means the same track id, the same ISRC or the same
+    normalized title, artists and duration (see track_identity), so another
+    release or relink of a recording already in the playlist is skipped.
+    Every yielded song is added to `target`, so of several equivalent liked
+    songs only the first one read is yielded.
+
+    `liked_songs` is only streamed, so feeding it newest first (iterLikedSongs()
+    or LibraryStore.iter_liked_songs(newest_first=True)) emits the missing
+    songs in write order without holding the library in memory.
+    """
     for song in liked_songs:
-        if song['uri'] not in target_uris:
-            missing_songs.append(song)
-    
-    return missing_songs
+        if target.add_new(song):
+            yield song
+
+def find_missing_songs(liked_songs: Iterable[Track], target_songs: Iterable[Track]) -> List[Track]:
+    """Find songs in liked but not (nor an equivalent) in the target playlist"""
+    return list(iter_missing_songs(liked_songs, IdentityIndex(target_songs)))
+
+def _with_added_now(songs: List[Track]) -> List[Track]:
+    """Copies of `songs` stamped with the current time, as cached playlist entries."""
+    added_at = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    return [Track.from_dict(song).with_added_at(added_at) for song in songs]
+
+def write_songs(access_token: str, playlist: Dict[str, Any], songs: List[Dict], cache: PlaylistCache = None,
+                position: int = None):
+    """Add songs to a playlist through a write journal and keep the cache in step.
+
+    The songs are appended, or inserted in order from `position` on (0
+    puts them at the top). Returns what addSongsToPlaylist returns. If the add fails part way, the
+    journal stays on disk so resume_interrupted_write() can finish it, and
+    the chunks that did go through are recorded in the cache.
+    """
+    playlist_id = playlist['id']
+    base_snapshot_id = playlist.get('snapshot_id')
+    journal = WriteJournal(playlist_id)
+    success = False
+    try:
+        success = addSongsToPlaylist(access_token, playlist_id, [song['uri'] for song in songs],
+                                     journal=journal, base_snapshot_id=base_snapshot_id, songs=songs,
+                                     position=position)
+    finally:
+        # Runs even if the add raised part way, so committed chunks are cached
+        if cache is not None:
+            if isinstance(success, str):
+                cache.insert(playlist_id, base_snapshot_id, success, _with_added_now(songs), position)
+            elif journal.exists() and journal.committed_chunks and journal.last_snapshot_id():
+                committed = songs[:journal.committed_chunks * journal.chunk_size]
+                cache.insert(playlist_id, base_snapshot_id, journal.last_snapshot_id(), _with_added_now(committed),
+                             position)
+            elif success or journal.committed_chunks:
+                cache.invalidate(playlist_id)
+    return success
+
+def resume_interrupted_write(access_token: str, playlist: Dict[str, Any], cache: PlaylistCache = None):
+    """Finish an add to `playlist` that an earlier run didn't complete.
+
+    Returns the playlist's new snapshot_id (True if unknown) after resuming,
+    None if there was nothing to resume and False if resuming failed.
+    """
+    journal = WriteJournal(playlist['id'])
+    if not journal.exists():
+        return None
+    print(f"{yellow}Resuming interrupted write to '{playlist.get('name', playlist['id'])}': "
+          f"{journal.committed_chunks}/{journal.total_chunks} chunks already added{clear}")
+    previous_snapshot_id = journal.last_snapshot_id()
+    songs = journal.songs
+    done = journal.committed_chunks * journal.chunk_size
+    remaining = (songs or [])[done:]
+    position = journal.position + done if journal.position is not None else None
+    success = resumeAddSongs(access_token, journal, playlist)
+    if cache is not None:
+        if isinstance(success, str) and songs is not None:
+            cache.insert(playlist['id'], previous_snapshot_id, success, _with_added_now(remaining), position)
+        else:
+            cache.invalidate(playlist['id'])
+    if success:
+        print(f"{darkgreen}OK:{clear} Finished interrupted write to '{cyan}{playlist.get('name', playlist['id'])}{clear}'")
+    return success
+
+def choose_target_playlist(access_token: str, default_playlist: bool = False) -> Optional[Dict[str, Any]]:
+    """Fetch the user's playlists and pick the target (DEFAULT_PLAYLIST_ID or interactively)"""
+    print(f"\n{blue}Fetching your playlists...{clear}")
+    playlists = getPlaylists(access_token)
+    if not playlists or 'items' not in playlists:
+        print(f"{red}No playlists found{clear}")
+        return None
+
+    print(f"{green}OK:{clear} Found {len(playlists['items'])}.")
+
+    if not default_playlist:
+        # Display playlists and get selection
+        target_playlist = selectPlaylistInteractively(playlists)
+        print(target_playlist)
+    else:
+        target_playlist = selectDefaultPlaylist(playlists)
+        if target_playlist:
+            print("Selected default playlist:", target_playlist.get("name"))
+
+    if not target_playlist: print(f"{red}No playlist selected{clear}")
+    return target_playlist
+
+def find_songs_to_add(access_token: str, target_playlist: Dict[str, Any], cache: PlaylistCache,
+                      full_sync: bool = False) -> Optional[List[Track]]:
+    """Fetch and diff: the liked songs missing from the target, newest first (write order)
+
+    Finishes any interrupted write first and brings the local liked songs
+    up to date. `target_playlist['snapshot_id']` is left at the snapshot the
+    diff was made against. Returns None (after printing why) on failure.
+    """
+    # Finish any add a previous run left half done before diffing again
+    try:
+        resumed = resume_interrupted_write(access_token, target_playlist, cache)
+    except SpotifyAPIError as e:
+        print(f"{red}{e}{clear}")
+        return None
+    if resumed is False:
+        print(f"{red}Failed to resume interrupted write{clear}")
+        return None
+    if isinstance(resumed, str):
+        target_playlist['snapshot_id'] = resumed
+    target_snapshot_id = target_playlist.get('snapshot_id')
+
+    print(f"\n{blue}Fetching your liked songs...{clear}")
+
+    # Step 2: Bring the local copy of the liked songs up to date
+    store = LibraryStore()
+    try:
+        sync_liked_songs(access_token, store, full=full_sync)
+    except SpotifyAPIError as e:
+        print(f"{red}{e}{clear}")
+        store.close()
+        return None
+
+    liked_count = store.count()
+    if not liked_count:
+        print(f"{red}No liked songs found{clear}")
+        store.close()
+        return None
+    print(f"{green}OK:{clear} Found {liked_count}.")
 
-def display_song_list(songs: List[Dict], title: str) -> None:
+    # Step 3: Index the target playlist's tracks (only identity hashes are kept)
+    print(f"\n{blue}Fetching songs from target playlist...{clear}")
+    try:
+        target_identities = get_target_identities(access_token, target_playlist['id'], target_snapshot_id, cache)
+    except SpotifyAPIError as e:
+        print(f"{red}{e}{clear}")
+        store.close()
+        return None
+    print(f"{green}OK:{clear} Found {len(target_identities)}.")
+
+    # Step 4: Stream the liked songs newest first past the target's identities, so
+    # the missing songs come out already in write order
+    try:
+        missing_reversed = list(iter_missing_songs(store.iter_liked_songs(newest_first=True), target_identities))
+    finally:
+        store.close()
+    return missing_reversed
+
+def display_song_list(songs: List[Track], title: str) -> None:
     """Display a list of songs in a formatted way"""
     print(f"\n{green}{title}{clear}")
     print("-" * 80)
     
     for idx, song in enumerate(songs, 1):
-        artists = song['artists']
-        name = song['name']
-        added_date = datetime.fromisoformat(song['added_at'].replace('Z', '+00:00')).strftime('%Y-%m-%d')
+        artists = song.artists
+        name = song.name
+        added_date = datetime.fromisoformat(song.added_at.replace('Z', '+00:00')).strftime('%Y-%m-%d')
         print(f"{idx:3d}. {blue}{name}{clear} - {cyan}{artists}{clear} ({yellow}{added_date}{clear})")
 
 def confirm_addition(missing_songs: List[Dict], target_playlist_name: str, supress_inquire: bool = False) -> bool:
     """Ask user for confirmation before adding songs"""
     print(f"\n{green}Ready to add {len(missing_songs)} songs to '{target_playlist_name}'{clear}")
     print(f"{blue}These songs will be added in reverse chronological order (newest first){clear}")
-    
+    return ask_to_proceed(supress_inquire)
+
+def ask_to_proceed(supress_inquire: bool = False) -> bool:
+    """Ask "Proceed?" (with InquirerPy if available) and return the answer"""
     if not supress_inquire:
         try:
             from InquirerPy import inquirer
@@ -78,7 +290,7 @@ def confirm_addition(missing_songs: List[Dict], target_playlist_name: str, supre
 
 
 
-def main(quiet: bool = False, default_playlist: bool = False):
+def main(quiet: bool = False, default_playlist: bool = False, full_sync: bool = False):
     """Main function to orchestrate the liked songs merging process"""
     clearTerminal()
     print(darkgreen + """
@@ -93,8 +305,8 @@ $$\   $$ |$$ |  $$ |$$ |  $$ | $$ |$$\ $$ |$$\ $$ |\$  /$$ |$$   ____|$$ |
           $$ |                                                                  $$\   $$ |                    
           $$ |                                                                  \$$$$$$  |                    
           \__|                                                                   \______/""" + clear)
-    # Start local server and obtain a valid access token (refresh if possible)
-    localServer.start_server(quiet=quiet)
+    # Obtain a valid access token (refresh if possible, browser login otherwise)
+    localServer.set_quiet(quiet)
     if not quiet:
         print(f"{blue}Authenticating with Spotify...{clear}")
     access_token = get_or_refresh_access_token(interactive=True)
@@ -107,81 +319,42 @@ $$\   $$ |$$ |  $$ |$$ |  $$ | $$ |$$\ $$ |$$\ $$ |\$  /$$ |$$   ____|$$ |
         return
 
     # Step 1: Get playlists and let user select target
-    print(f"\n{blue}Fetching your playlists...{clear}")
-    playlists = getPlaylists(access_token)
-    if not playlists or 'items' not in playlists:
-        print(f"{red}No playlists found{clear}")
+    target_playlist = choose_target_playlist(access_token, default_playlist)
+    if not target_playlist:
         return
 
-    # Apply progress bar to the items in the playlists dictionary
-    playlists['items'] = list(customProgressBar(playlists['items'], total=len(playlists['items'])))
-
-    print(f"{green}OK:{clear} Found {len(playlists['items'])}.")
-
-    if not default_playlist:
-        # Display playlists and get selection
-        target_playlist = selectPlaylistInteractively(playlists)
-        print(target_playlist)
-    else:
-        target_playlist = selectDefaultPlaylist(playlists)
-        print("Selected default playlist:", target_playlist.get("name"))
-
-    if not target_playlist: print(f"{red}No playlist selected{clear}") ; return
-
-    target_playlist_id = target_playlist['id']
     target_playlist_name = target_playlist['name']
-
-    # Apply progress bar to liked songs
-    print(f"\n{blue}Fetching your liked songs...{clear}")
-
-    # Step 2: Get liked songs (ordered oldest to newest)
-    liked_songs = get_liked_songs_ordered(access_token)
-
-    if not liked_songs:
-        print(f"{red}No liked songs found{clear}")
+    cache = PlaylistCache()
+    missing_reversed = find_songs_to_add(access_token, target_playlist, cache, full_sync)
+    if missing_reversed is None:
+        cache.close()
         return
-    liked_songs = list(customProgressBar(liked_songs, total=len(liked_songs)))
-    print(f"{green}OK:{clear} Found {len(liked_songs)}.")
 
-    # Step 3: Get songs from target playlist
-    print(f"\n{blue}Fetching songs from target playlist...{clear}")
-    # Fetch songs and show progress as they are loaded
-    target_songs_raw = get_target_playlist_songs(access_token, target_playlist_id)
-
-    if not target_songs_raw:
-        print(f"{red}Failed to fetch target playlist songs{clear}")
-        return
-
-    # Use progress bar directly without appending to a new list
-    target_songs = list(customProgressBar(target_songs_raw, total=len(target_songs_raw)))
-    print(f"{green}OK:{clear} Found {len(target_songs)}.")
-
-    # Step 4: Find missing songs
-    missing_songs = find_missing_songs(liked_songs, target_songs)
-
-    if not missing_songs:
+    if not missing_reversed:
         print(f"\n{darkgreen}All liked songs are already in the target playlist!{clear}")
+        cache.close()
         return
 
-    print(f"\n{green}OK:{clear} Found {len(missing_songs)} to add.")
+    print(f"\n{green}OK:{clear} Found {len(missing_reversed)} to add.")
 
-    # Step 5: Display missing songs (in reverse order - newest first)
-    missing_reversed = list(reversed(missing_songs))
+    # Step 5: Display missing songs (newest first)
     display_song_list(missing_reversed, f"Songs to add to '{target_playlist_name}' (newest first)")
 
     # Step 6: Confirm addition
-    if not confirm_addition(missing_songs, target_playlist_name):
+    if not confirm_addition(missing_reversed, target_playlist_name):
         print(f"{darkred}Operation cancelled by user{clear}")
+        cache.close()
         return
 
-    # Step 7: Add songs in reverse order (newest first)
-    track_uris = [song['uri'] for song in missing_reversed]
-
-    print(f"\nAdding songs to playlist...")
-    success = addSongsToPlaylist(access_token, target_playlist_id, track_uris)
+    # Step 7: Add songs in reverse order (newest first), at the top of the
+    # playlist unless SPOTIFY_INSERT_AT=bottom. The write is journaled and
+    # the cache updated so the next run can skip the fetch.
+    print("\nAdding songs to playlist...")
+    success = write_songs(access_token, target_playlist, missing_reversed, cache, position=insert_position())
+    cache.close()
 
     if success:
-        print(f"{darkgreen}OK:{clear} Added {len(missing_songs)} songs to '{cyan}{target_playlist_name}{clear}'")
+        print(f"{darkgreen}OK:{clear} Added {len(missing_reversed)} songs to '{cyan}{target_playlist_name}{clear}'")
     else:
         print(f"{red}Failed to add songs to playlist{clear}")
 
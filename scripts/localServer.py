@@ -1,24 +1,73 @@
 # localServer.py
 
 from flask import Flask, request, make_response
+from werkzeug.serving import make_server
+import secrets
 import threading
 import logging
 
 app = Flask(__name__)
-auth_code = None
+
+_server = None
+_server_thread = None
+_server_lock = threading.Lock()
+
+# Auth requests waiting for their redirect, keyed by the OAuth `state` value
+_pending = {}
+_pending_lock = threading.Lock()
+
+
+class AuthRequest:
+    """One interactive login waiting for its redirect.
+
+    The `state` sent to Spotify comes back on the redirect, so the callback
+    hands the code to exactly this request and nothing is left behind for a
+    later login to pick up by mistake.
+    """
+
+    def __init__(self):
+        self.state = secrets.token_urlsafe(16)
+        self.code = None
+        self.error = None
+        self.done = threading.Event()
+
+    def wait(self, timeout: float = None):
+        """Block until the redirect arrives (or `timeout` passes); return the code or None."""
+        self.done.wait(timeout)
+        return self.code
+
+
+def begin_auth() -> AuthRequest:
+    """Register a new auth request; pass its `state` in the authorize URL."""
+    auth = AuthRequest()
+    with _pending_lock:
+        _pending[auth.state] = auth
+    return auth
+
+
+def end_auth(auth: AuthRequest):
+    """Forget an auth request (completed, timed out or abandoned)."""
+    with _pending_lock:
+        _pending.pop(auth.state, None)
 
 
 @app.route('/callback')
 def callback():
         """OAuth redirect endpoint.
 
-        Returns an HTML page that will attempt to automatically close the tab/window
-        and notify any opener via postMessage. Note: modern browsers restrict
-        programmatic window closing for tabs not opened by script; this is a
-        best-effort approach.
+        Hands the code (or error) to the auth request whose `state` matches
+        and wakes its waiter. Returns an HTML page that will attempt to
+        automatically close the tab/window and notify any opener via
+        postMessage. Note: modern browsers restrict programmatic window
+        closing for tabs not opened by script; this is a best-effort approach.
         """
-        global auth_code
-        auth_code = request.args.get('code')
+        with _pending_lock:
+            auth = _pending.pop(request.args.get('state'), None)
+        if auth is None:
+            return make_response("Unknown or expired login request. Please start the login again.", 400)
+        auth.code = request.args.get('code')
+        auth.error = request.args.get('error')
+        auth.done.set()
 
         html = '''<!doctype html>
 <html lang="en">
@@ -63,29 +112,39 @@ def callback():
         return resp
 
 
-def start_server(quiet: bool = False):
-    """Start the local flask server.
+def set_quiet(quiet: bool = True):
+    """Hide (or, with quiet=False, show again) werkzeug/flask output for the callback server."""
+    # The loggers are the only state: NOTSET lets werkzeug fall back to its own INFO request log
+    level = logging.ERROR if quiet else logging.NOTSET
+    logging.getLogger('werkzeug').setLevel(level)
+    logging.getLogger('flask.app').setLevel(level)
 
-    If quiet is True, suppress werkzeug/flask startup output.
+
+def start_server(quiet: bool = None, host: str = '127.0.0.1', port: int = 8888):
+    """Start the local callback server if it isn't running yet.
+
+    The server runs only while a login waits for its redirect; call
+    stop_server() afterwards. If quiet is True, suppress werkzeug/flask
+    output (None keeps the setting from set_quiet()).
     """
-    if quiet:
-        # Reduce verbosity from werkzeug/flask to hide the development server banner
-        try:
-            logging.getLogger('werkzeug').setLevel(logging.ERROR)
-        except Exception:
-            pass
-        try:
-            logging.getLogger('flask.app').setLevel(logging.ERROR)
-        except Exception:
-            pass
-
-    # Ensure Flask doesn't try to display its banner if running newer versions
-    # (Flask 2.2+ supports show_server_banner argument, but we call via app.run
-    # inside a thread so forcing log level is simpler).
-    thread = threading.Thread(target=lambda: app.run(host='127.0.0.1', port=8888, debug=False, use_reloader=False))
-    thread.daemon = True
-    thread.start()
-
-
-def get_auth_code():
-    return auth_code
+    global _server, _server_thread
+    if quiet is not None:
+        set_quiet(quiet)
+    with _server_lock:
+        if _server is not None:
+            return
+        _server = make_server(host, port, app, threaded=True)
+        _server_thread = threading.Thread(target=_server.serve_forever, name='oauth-callback-server')
+        _server_thread.start()
+
+
+def stop_server():
+    """Shut the callback server down and wait for its thread to exit."""
+    global _server, _server_thread
+    with _server_lock:
+        server, thread = _server, _server_thread
+        _server = _server_thread = None
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+        thread.join()
@@ -0,0 +1,192 @@
+# scripts/merge_engine.py
+
+"""
+Many-to-one merge engine
+Merges any number of source playlists (and optionally Liked Songs) into one
+target playlist in a single pass: sources are fetched concurrently, the
+target's URI set is built once and everything is written in one batched add.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import zip_longest
+from typing import List, Dict, Any
+
+from .spotify_utils import *
+from .colors import *
+from . import localServer
+from .library_store import LibraryStore
+from .playlist_cache import PlaylistCache
+from .track_identity import IdentityIndex
+from .liked_songs_merger import (
+    get_liked_songs_ordered,
+    display_song_list,
+    ask_to_proceed,
+    write_songs,
+    resume_interrupted_write,
+)
+
+# Source id that stands for the user's Liked Songs
+LIKED_SONGS = 'liked'
+
+# Orderings for the songs written to the target, with how they're described to the user
+ORDERINGS = {
+    'added_at': 'newest first across all sources',
+    'round_robin': 'one song from each source in turn',
+    'priority': 'all of the first source, then the second, ...',
+}
+
+# Number of source playlists fetched at the same time
+SOURCE_WORKERS = int(os.getenv('SPOTIFY_SOURCE_WORKERS', 4))
+
+
+def fetch_sources(access_token: str, source_ids: List[str], store: LibraryStore = None,
+                  workers: int = SOURCE_WORKERS) -> Dict[str, List[Dict[str, Any]]]:
+    """Fetch every source concurrently. Returns {source_id: songs in source order}.
+
+    Playlists keep their playlist order; Liked Songs are returned newest
+    first. Liked Songs are synced on the calling thread (the LibraryStore's
+    SQLite connection can't be shared) while the playlists download.
+    """
+    playlist_ids = [s for s in source_ids if s != LIKED_SONGS]
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {
+            pid: pool.submit(getPlaylistItemsDetailed, access_token, pid, show_progress=False)
+            for pid in playlist_ids
+        }
+        if LIKED_SONGS in source_ids:
+            results[LIKED_SONGS] = list(reversed(get_liked_songs_ordered(access_token, store)))
+        for pid, future in futures.items():
+            results[pid] = future.result()
+    return results
+
+
+def order_songs(sources: Dict[str, List[Dict[str, Any]]], source_ids: List[str], order: str = 'added_at') -> List[Dict[str, Any]]:
+    """Combine the sources into one candidate list according to `order`."""
+    if order not in ORDERINGS:
+        raise ValueError(f"Unknown ordering '{order}', expected one of {', '.join(ORDERINGS)}")
+    lists = [sources.get(s, []) for s in source_ids]
+    if order == 'priority':
+        return [song for songs in lists for song in songs]
+    if order == 'round_robin':
+        return [song for row in zip_longest(*lists) for song in row if song is not None]
+    combined = [song for songs in lists for song in songs]
+    combined.sort(key=lambda x: x['added_at'], reverse=True)
+    return combined
+
+
+def plan_merge(sources: Dict[str, List[Dict[str, Any]]], source_ids: List[str], target_songs: List[Dict[str, Any]],
+               order: str = 'added_at') -> List[Dict[str, Any]]:
+    """Return the songs to add, in write order, deduplicated across all sources and the target.
+
+    Songs are deduplicated by identity (see track_identity), so another
+    release of a recording that is already there is not added again.
+    """
+    seen = IdentityIndex(target_songs)
+    to_add = []
+    for song in order_songs(sources, source_ids, order):
+        if seen.add_new(song):
+            to_add.append(song)
+    return to_add
+
+
+def merge_sources(access_token: str, target_playlist: Dict[str, Any], source_ids: List[str], order: str = 'added_at',
+                  store: LibraryStore = None, cache: PlaylistCache = None,
+                  workers: int = SOURCE_WORKERS) -> List[Dict[str, Any]]:
+    """Fetch the sources and the target and return the songs to add (nothing is written)."""
+    target_id = target_playlist['id']
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        # The target is fetched next to the sources unless the cache has it
+        cached = cache.get(target_id, target_playlist.get('snapshot_id')) if cache is not None else None
+        target_future = None
+        if cached is None:
+            target_future = pool.submit(getPlaylistItemsDetailed, access_token, target_id, show_progress=False)
+        sources = fetch_sources(access_token, source_ids, store, workers)
+        if target_future is not None:
+            target_songs = target_future.result()
+            if cache is not None:
+                cache.put(target_id, target_playlist.get('snapshot_id'), target_songs)
+        else:
+            target_songs = cached
+    return plan_merge(sources, source_ids, target_songs, order)
+
+
+def main(source_ids: List[str], target_id: str = None, order: str = 'added_at', quiet: bool = False,
+         assume_yes: bool = False):
+    """Merge several sources into one target playlist."""
+    if order not in ORDERINGS:
+        print(f"{red}Unknown ordering '{order}', expected one of {', '.join(ORDERINGS)}{clear}")
+        return
+    if not source_ids:
+        print(f"{red}No sources given{clear}")
+        return
+
+    localServer.set_quiet(quiet)
+    access_token = get_or_refresh_access_token(interactive=True)
+    if not access_token:
+        print(f"{red}Failed to get access token{clear}")
+        return
+
+    print(f"\n{blue}Fetching your playlists...{clear}")
+    playlists = getPlaylists(access_token)
+    if not playlists or 'items' not in playlists:
+        print(f"{red}No playlists found{clear}")
+        return
+
+    target_id = target_id or os.getenv("DEFAULT_PLAYLIST_ID")
+    if target_id:
+        target_playlist = next((pl for pl in playlists['items'] if pl.get('id') == target_id), None)
+    else:
+        target_playlist = selectPlaylistInteractively(playlists)
+    if not target_playlist:
+        print(f"{red}No writable target playlist selected{clear}")
+        return
+
+    store = LibraryStore()
+    cache = PlaylistCache()
+    try:
+        try:
+            resumed = resume_interrupted_write(access_token, target_playlist, cache)
+        except SpotifyAPIError as e:
+            print(f"{red}{e}{clear}")
+            return
+        if resumed is False:
+            print(f"{red}Failed to resume interrupted write{clear}")
+            return
+        if isinstance(resumed, str):
+            target_playlist['snapshot_id'] = resumed
+
+        names = {pl['id']: pl['name'] for pl in playlists['items']}
+        names[LIKED_SONGS] = 'Liked Songs'
+        print(f"\n{blue}Fetching {len(source_ids)} sources and '{target_playlist['name']}'...{clear}")
+
+        try:
+            songs = merge_sources(access_token, target_playlist, source_ids, order, store, cache)
+        except SpotifyAPIError as e:
+            print(f"{red}{e}{clear}")
+            return
+
+        if not songs:
+            print(f"\n{darkgreen}All source songs are already in the target playlist!{clear}")
+            return
+
+        sources_label = ', '.join(names.get(s, s) for s in source_ids)
+        display_song_list(songs, f"Songs to add to '{target_playlist['name']}' from {sources_label} ({order})")
+
+        if not assume_yes:
+            print(f"\n{green}Ready to add {len(songs)} songs to '{target_playlist['name']}'{clear}")
+            print(f"{blue}These songs will be added {ORDERINGS[order]}{clear}")
+            if not ask_to_proceed():
+                print(f"{darkred}Operation cancelled by user{clear}")
+                return
+
+        print("\nAdding songs to playlist...")
+        success = write_songs(access_token, target_playlist, songs, cache)
+    finally:
+        store.close()
+        cache.close()
+    if success:
+        print(f"{darkgreen}OK:{clear} Added {len(songs)} songs to '{cyan}{target_playlist['name']}{clear}'")
+    else:
+        print(f"{red}Failed to add songs to playlist{clear}")
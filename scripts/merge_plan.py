@@ -0,0 +1,187 @@
+# scripts/merge_plan.py
+
+"""
+Plan / apply
+`plan` does the expensive part of a merge (liked songs sync, target fetch,
+diff) and writes the result to a small JSON file: the target playlist, the
+snapshot_id the diff was made against and the URIs to add in request-sized
+chunks. `apply` sends a plan without fetching anything again, and refuses
+if the playlist has changed since it was planned.
+"""
+
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from .spotify_utils import *
+from .colors import *
+from . import localServer
+from .playlist_cache import PlaylistCache
+from .write_journal import WriteJournal
+from .liked_songs_merger import (
+    ask_to_proceed,
+    choose_target_playlist,
+    display_song_list,
+    find_songs_to_add,
+    insert_position,
+)
+
+# Where plans are written and read by default
+PLAN_FILE = os.getenv('SPOTIFY_PLAN_FILE', 'merge_plan.json')
+
+PLAN_VERSION = 1
+PLAN_CHUNK_SIZE = 100
+
+
+class StalePlanError(Exception):
+    """Raised when a plan can't be applied because its target has changed since it was made."""
+
+
+def make_plan(playlist: Dict[str, Any], songs: List[Any], position: Optional[int] = None) -> Dict[str, Any]:
+    """Build a plan adding `songs` (in order) to `playlist` at its current snapshot_id."""
+    uris = [song['uri'] for song in songs]
+    return {
+        'version': PLAN_VERSION,
+        'playlist_id': playlist['id'],
+        'playlist_name': playlist.get('name'),
+        'snapshot_id': playlist.get('snapshot_id'),
+        'position': position,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'chunks': [uris[i:i + PLAN_CHUNK_SIZE] for i in range(0, len(uris), PLAN_CHUNK_SIZE)],
+    }
+
+
+def plan_uris(plan: Dict[str, Any]) -> List[str]:
+    return [uri for chunk in plan['chunks'] for uri in chunk]
+
+
+def save_plan(plan: Dict[str, Any], path: str = PLAN_FILE):
+    # Write to a temp file and rename so a reader never sees half a plan
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(plan, f, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+def load_plan(path: str = PLAN_FILE) -> Dict[str, Any]:
+    """Read a plan file. Raises OSError if it can't be read, ValueError if it isn't a plan."""
+    with open(path, 'r', encoding='utf-8') as f:
+        plan = json.load(f)
+    if not isinstance(plan, dict) or plan.get('version') != PLAN_VERSION:
+        raise ValueError(f"{path} is not a version {PLAN_VERSION} merge plan")
+    if not plan.get('playlist_id') or not plan.get('snapshot_id') or not isinstance(plan.get('chunks'), list):
+        raise ValueError(f"{path} is missing the playlist, snapshot_id or chunks")
+    if any(not isinstance(chunk, list) or len(chunk) > PLAN_CHUNK_SIZE for chunk in plan['chunks']):
+        raise ValueError(f"{path} has chunks of more than {PLAN_CHUNK_SIZE} tracks")
+    return plan
+
+
+def apply_plan(access_token: str, plan: Dict[str, Any], cache: PlaylistCache = None):
+    """Send a plan's adds, journaled like any other write.
+
+    The playlist's snapshot_id is checked first (one small request) and
+    StalePlanError is raised if it moved since the plan was made. If an
+    earlier apply of the same plan was interrupted, that write is finished
+    instead. Returns what addSongsToPlaylist returns.
+    """
+    playlist_id = plan['playlist_id']
+    uris = plan_uris(plan)
+    journal = WriteJournal(playlist_id)
+    current = getPlaylistSnapshot(access_token, playlist_id)
+    if journal.exists():
+        if journal.uris != uris or journal.base_snapshot_id != plan['snapshot_id']:
+            raise StalePlanError("Another write to this playlist was interrupted; run the merger to finish it "
+                                 "and plan again")
+        print(f"{yellow}Resuming interrupted apply: {journal.committed_chunks}/{journal.total_chunks} "
+              f"chunks already added{clear}")
+        result = resumeAddSongs(access_token, journal, current)
+    elif current.get('snapshot_id') != plan['snapshot_id']:
+        raise StalePlanError("The playlist has changed since the plan was made; plan again")
+    else:
+        result = addSongsToPlaylist(access_token, playlist_id, uris, journal=journal,
+                                    base_snapshot_id=plan['snapshot_id'], position=plan.get('position'))
+    # The plan only has URIs, not the details the cache keeps
+    if cache is not None:
+        cache.invalidate(playlist_id)
+    return result
+
+
+def print_plan_summary(plan: Dict[str, Any]):
+    count = sum(len(chunk) for chunk in plan['chunks'])
+    where = 'at the top' if plan.get('position') == 0 else (
+        'appended' if plan.get('position') is None else f"from position {plan['position']}")
+    print(f"\n{green}Plan for '{plan.get('playlist_name') or plan['playlist_id']}'{clear} "
+          f"({black}{plan['playlist_id']}{clear} at snapshot {black}{plan['snapshot_id']}{clear})")
+    print(f"  {cyan}{count}{clear} songs to add {where}, {len(plan['chunks'])} requests, "
+          f"planned {plan.get('created_at')}")
+
+
+def plan_main(path: str = PLAN_FILE, quiet: bool = False, default_playlist: bool = False, full_sync: bool = False):
+    """Fetch and diff, then write the merge plan to `path` instead of adding anything."""
+    localServer.set_quiet(quiet)
+    access_token = get_or_refresh_access_token(interactive=True)
+    if not access_token:
+        print(f"{red}Failed to get access token{clear}")
+        return
+    target_playlist = choose_target_playlist(access_token, default_playlist)
+    if not target_playlist:
+        return
+
+    cache = PlaylistCache()
+    try:
+        missing_reversed = find_songs_to_add(access_token, target_playlist, cache, full_sync)
+    finally:
+        cache.close()
+    if missing_reversed is None:
+        return
+    if not missing_reversed:
+        print(f"\n{darkgreen}All liked songs are already in the target playlist!{clear}")
+        return
+
+    display_song_list(missing_reversed, f"Songs to add to '{target_playlist['name']}' (newest first)")
+    plan = make_plan(target_playlist, missing_reversed, insert_position())
+    save_plan(plan, path)
+    print_plan_summary(plan)
+    print(f"{darkgreen}OK:{clear} Plan written to {path}; run with --apply {path} to send it")
+
+
+def apply_main(path: str = PLAN_FILE, quiet: bool = False, assume_yes: bool = False):
+    """Apply the merge plan in `path` without fetching or diffing again."""
+    try:
+        plan = load_plan(path)
+    except (OSError, ValueError) as e:
+        print(f"{red}Can't read plan: {e}{clear}")
+        return
+    print_plan_summary(plan)
+    if not plan['chunks']:
+        print(f"{darkgreen}Nothing to add{clear}")
+        return
+
+    localServer.set_quiet(quiet)
+    access_token = get_or_refresh_access_token(interactive=True)
+    if not access_token:
+        print(f"{red}Failed to get access token{clear}")
+        return
+    if not assume_yes and not ask_to_proceed():
+        print(f"{darkred}Operation cancelled by user{clear}")
+        return
+
+    cache = PlaylistCache()
+    try:
+        result = apply_plan(access_token, plan, cache)
+    except StalePlanError as e:
+        print(f"{red}Refusing to apply: {e}{clear}")
+        return
+    except SpotifyAPIError as e:
+        print(f"{red}{e}{clear}")
+        return
+    finally:
+        cache.close()
+    if result:
+        print(f"{darkgreen}OK:{clear} Added {len(plan_uris(plan))} songs to "
+              f"'{cyan}{plan.get('playlist_name') or plan['playlist_id']}{clear}'")
+    else:
+        print(f"{red}Failed to add songs; run --apply again to continue from the last added chunk{clear}")
@@ -0,0 +1,273 @@
+# scripts/mirror.py
+
+"""
+Mirror mode
+Makes a playlist an exact copy of Liked Songs, in Liked Songs order (newest
+first). The playlist is diffed against the liked songs and only the edit
+script between the two is sent: batched removes, inserts at `position` and
+range moves, so keeping a large mirror exact takes a handful of requests.
+"""
+
+import bisect
+from typing import Any, Dict, List, Optional
+
+from .spotify_utils import *
+from .colors import *
+from . import localServer
+from .playlist_cache import PlaylistCache
+from .library_store import LibraryStore, sync_liked_songs
+from .liked_songs_merger import ask_to_proceed, resume_interrupted_write
+
+# Local files and empty slots can't be moved or removed through the API; they stay put
+_FIXED_PREFIX = 'spotify:local:'
+
+
+def longest_increasing_run(values: List[int]) -> List[int]:
+    """Indexes of one longest strictly increasing subsequence of `values` (patience sorting, O(n log n))."""
+    tails = []            # tails[k]: index of the smallest tail of an increasing run of length k + 1
+    tail_values = []
+    previous = [-1] * len(values)
+    for i, value in enumerate(values):
+        k = bisect.bisect_left(tail_values, value)
+        if k:
+            previous[i] = tails[k - 1]
+        if k == len(tails):
+            tails.append(i)
+            tail_values.append(value)
+        else:
+            tails[k] = i
+            tail_values[k] = value
+    run = []
+    i = tails[-1] if tails else -1
+    while i != -1:
+        run.append(i)
+        i = previous[i]
+    run.reverse()
+    return run
+
+
+def plan_mirror(source: List[str], target: List[Optional[str]]) -> List[Dict[str, Any]]:
+    """Compute the edit script that turns `target` into `source`.
+
+    `source` is the wanted order of (distinct) track URIs, `target` the
+    playlist as it is now, with None for empty slots. The script is, in
+    order of application:
+
+    - one {'op': 'remove', 'tracks': [(position, uri)]} for every track that
+      isn't wanted or is a repeat, with positions in the current playlist;
+    - {'op': 'move', 'range_start', 'range_length', 'insert_before'} for
+      runs of tracks outside the longest common subsequence of the two
+      orders, with positions as they are when the move is made;
+    - {'op': 'insert', 'position', 'uris'} for runs of missing tracks, at
+      most 100 per insert.
+
+    Tracks already in relative order are never touched, and consecutive
+    tracks travel together. Two other scripts are costed as well: removing
+    the out-of-order tracks and inserting them again, and a full rebuild
+    (remove everything, insert `source` 100 at a time). Whichever takes
+    the fewest requests is returned, preferring moves, then re-inserts, on
+    a tie, since re-inserted tracks lose their date added. Empty slots and
+    local files are left in place (after a rebuild they end up at the
+    bottom).
+    """
+    candidates = [_plan_mirror(source, target, reinsert=False), _plan_mirror(source, target, reinsert=True),
+                  _plan_rebuild(source, target)]
+    return min(candidates, key=count_requests)
+
+
+def _plan_mirror(source: List[str], target: List[Optional[str]], reinsert: bool) -> List[Dict[str, Any]]:
+    wanted = {uri: i for i, uri in enumerate(source)}
+    script = []
+
+    # 1. Drop what isn't wanted, keeping the first occurrence of each track
+    removals = []
+    current = []
+    kept_at = {}
+    for position, uri in enumerate(target):
+        if uri is None or uri.startswith(_FIXED_PREFIX):
+            current.append(None)
+        elif uri not in wanted or uri in kept_at:
+            removals.append((position, uri))
+        else:
+            kept_at[uri] = position
+            current.append(uri)
+    order = [wanted[uri] for uri in current if uri is not None]
+    kept = sorted(order[i] for i in longest_increasing_run(order))
+    moved = set(order) - set(kept)
+    if reinsert and moved:
+        # Out-of-order tracks go out with the unwanted ones and come back with the missing ones
+        moved_uris = {source[index] for index in moved}
+        removals += [(kept_at[uri], uri) for uri in moved_uris]
+        current = [uri for uri in current if uri not in moved_uris]
+        moved = set()
+    if removals:
+        script.append({'op': 'remove', 'tracks': removals})
+
+    # 2. Keep the longest run already in source order; move the rest in blocks
+    blocks = []
+    last_position = None
+    for position, uri in enumerate(current):
+        index = wanted.get(uri)
+        if index not in moved:
+            continue
+        if blocks and last_position == position - 1 and blocks[-1][-1] == index - 1:
+            blocks[-1].append(index)
+        else:
+            blocks.append([index])
+        last_position = position
+    blocks.sort()
+    for block in blocks:
+        start = current.index(source[block[0]])
+        length = len(block)
+        anchor = bisect.bisect_left(kept, block[0])
+        insert_before = current.index(source[kept[anchor - 1]]) + 1 if anchor else 0
+        if not start <= insert_before <= start + length:
+            script.append({'op': 'move', 'range_start': start, 'range_length': length,
+                           'insert_before': insert_before})
+            items = current[start:start + length]
+            del current[start:start + length]
+            destination = insert_before - length if insert_before > start else insert_before
+            current[destination:destination] = items
+        for index in block:
+            bisect.insort(kept, index)
+
+    # 3. Insert what's missing, run by run, merging into the (now ordered) playlist
+    present = set(current)
+    result = []
+    p = 0
+    i = 0
+    while i < len(source):
+        if source[i] in present:
+            while current[p] != source[i]:
+                result.append(current[p])
+                p += 1
+            result.append(current[p])
+            p += 1
+            i += 1
+            continue
+        run_end = i
+        while run_end < len(source) and source[run_end] not in present:
+            run_end += 1
+        for start in range(i, run_end, 100):
+            uris = source[start:min(start + 100, run_end)]
+            script.append({'op': 'insert', 'position': len(result), 'uris': uris})
+            result.extend(uris)
+        i = run_end
+    return script
+
+
+def _plan_rebuild(source: List[str], target: List[Optional[str]]) -> List[Dict[str, Any]]:
+    """Remove every track that can be removed, then insert `source` from the top, 100 per insert."""
+    removals = [(position, uri) for position, uri in enumerate(target)
+                if uri is not None and not uri.startswith(_FIXED_PREFIX)]
+    script = [{'op': 'remove', 'tracks': removals}] if removals else []
+    for start in range(0, len(source), 100):
+        script.append({'op': 'insert', 'position': start, 'uris': source[start:start + 100]})
+    return script
+
+
+def count_requests(script: List[Dict[str, Any]]) -> int:
+    """Number of API requests the edit script takes."""
+    return sum((len(step['tracks']) + 99) // 100 if step['op'] == 'remove' else 1 for step in script)
+
+
+def apply_mirror(access_token: str, playlist_id: str, script: List[Dict[str, Any]], snapshot_id: str):
+    """Send the edit script, each request against the snapshot the previous one returned.
+
+    Returns the final snapshot_id (True if Spotify sent none), False as soon
+    as a request fails.
+    """
+    result = snapshot_id or True
+    for step in script:
+        if step['op'] == 'remove':
+            result = removeSongsAtPositions(access_token, playlist_id, step['tracks'], result)
+        elif step['op'] == 'move':
+            result = reorderPlaylistItems(access_token, playlist_id, step['range_start'], step['insert_before'],
+                                          step['range_length'], result)
+        else:
+            result = insertSongsAtPosition(access_token, playlist_id, step['uris'], step['position'])
+        if not result:
+            return False
+    return result
+
+
+def print_mirror_report(script: List[Dict[str, Any]], playlist_name: str):
+    removed = sum(len(step['tracks']) for step in script if step['op'] == 'remove')
+    moved = sum(step['range_length'] for step in script if step['op'] == 'move')
+    moves = sum(1 for step in script if step['op'] == 'move')
+    inserted = sum(len(step['uris']) for step in script if step['op'] == 'insert')
+    requests_needed = count_requests(script)
+    print(f"\n{green}Mirroring Liked Songs into '{playlist_name}'{clear}")
+    print("-" * 80)
+    print(f"  {cyan}{removed}{clear} tracks to remove")
+    print(f"  {cyan}{moved}{clear} tracks to move in {moves} ranges")
+    print(f"  {cyan}{inserted}{clear} tracks to insert")
+    print(f"\nThis takes {requests_needed} request{'s' if requests_needed != 1 else ''}")
+
+
+def main(playlist_id: str = None, dry_run: bool = False, quiet: bool = False, assume_yes: bool = False,
+         full_sync: bool = False):
+    """Make a playlist (chosen interactively if no id is given) mirror Liked Songs exactly."""
+    localServer.set_quiet(quiet)
+    access_token = get_or_refresh_access_token(interactive=True)
+    if not access_token:
+        print(f"{red}Failed to get access token{clear}")
+        return
+
+    print(f"\n{blue}Fetching your playlists...{clear}")
+    playlists = getPlaylists(access_token)
+    if not playlists or 'items' not in playlists:
+        print(f"{red}No playlists found{clear}")
+        return
+    if playlist_id:
+        playlist = next((pl for pl in playlists['items'] if pl.get('id') == playlist_id), None)
+    else:
+        playlist = selectPlaylistInteractively(playlists)
+    if not playlist:
+        print(f"{red}No writable playlist selected{clear}")
+        return
+
+    cache = PlaylistCache()
+    store = LibraryStore()
+    try:
+        try:
+            if not dry_run and resume_interrupted_write(access_token, playlist, cache) is False:
+                print(f"{red}Failed to resume interrupted write{clear}")
+                return
+            print(f"\n{blue}Fetching your liked songs...{clear}")
+            sync_liked_songs(access_token, store, full=full_sync)
+            source = [song.uri for song in store.iter_liked_songs(newest_first=True)]
+            print(f"\n{blue}Fetching '{playlist['name']}'...{clear}")
+            snapshot_id = getPlaylistSnapshot(access_token, playlist['id']).get('snapshot_id')
+            target = [track.uri if track else None for track in
+                      getPlaylistItemsDetailed(access_token, playlist['id'], fields=TRACK_URI_FIELDS,
+                                               keep_empty=True)]
+            if getPlaylistSnapshot(access_token, playlist['id']).get('snapshot_id') != snapshot_id:
+                print(f"{red}'{playlist['name']}' changed while it was being read; try again{clear}")
+                return
+        except SpotifyAPIError as e:
+            print(f"{red}{e}{clear}")
+            return
+
+        script = plan_mirror(source, target)
+        del source, target
+        if not script:
+            print(f"\n{darkgreen}'{playlist['name']}' already mirrors your liked songs!{clear}")
+            return
+        print_mirror_report(script, playlist['name'])
+        if dry_run:
+            print(f"{yellow}Dry run: nothing was changed{clear}")
+            return
+        if not assume_yes and not ask_to_proceed():
+            print(f"{darkred}Operation cancelled by user{clear}")
+            return
+
+        result = apply_mirror(access_token, playlist['id'], script, snapshot_id)
+        cache.invalidate(playlist['id'])
+        if result:
+            print(f"{darkgreen}OK:{clear} '{cyan}{playlist['name']}{clear}' now mirrors your liked songs")
+        else:
+            print(f"{red}Failed to update the mirror; run again to continue from the playlist's current state{clear}")
+    finally:
+        store.close()
+        cache.close()
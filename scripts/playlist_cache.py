@@ -0,0 +1,174 @@
+# scripts/playlist_cache.py
+
+import os
+import sqlite3
+import time
+from typing import Iterable, List, Optional
+
+from .library_store import LIBRARY_DB, add_missing_columns
+from .tracks import Track, dump_artists, load_artists
+from .track_identity import IdentityIndex
+
+# How many playlists are kept before the least recently used one is evicted.
+PLAYLIST_CACHE_SIZE = int(os.getenv('SPOTIFY_PLAYLIST_CACHE_SIZE', 20))
+
+
+class PlaylistCache:
+    """Cache of playlist contents keyed by playlist id and `snapshot_id`.
+
+    Spotify changes a playlist's `snapshot_id` on every edit, so cached
+    tracks are only served while the snapshot still matches. Lives in the
+    same SQLite file as the LibraryStore and evicts least recently used
+    playlists beyond `max_playlists`.
+    """
+
+    def __init__(self, path: str = LIBRARY_DB, max_playlists: int = PLAYLIST_CACHE_SIZE):
+        self.path = path
+        self.max_playlists = max_playlists
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cached_playlists ("
+            " playlist_id TEXT PRIMARY KEY, snapshot_id TEXT, last_used REAL)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cached_playlist_tracks ("
+            " playlist_id TEXT, position INTEGER, name TEXT, uri TEXT, artists TEXT, added_at TEXT,"
+            " isrc TEXT, duration_ms INTEGER, PRIMARY KEY (playlist_id, position))"
+        )
+        if add_missing_columns(self.conn, 'cached_playlist_tracks', {'isrc': 'TEXT', 'duration_ms': 'INTEGER'}):
+            # Entries cached without ISRCs would never match by identity; start over
+            self.conn.execute("DELETE FROM cached_playlist_tracks")
+            self.conn.execute("DELETE FROM cached_playlists")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def snapshot(self, playlist_id: str) -> Optional[str]:
+        """Return the snapshot_id the playlist is cached at, or None."""
+        row = self.conn.execute(
+            "SELECT snapshot_id FROM cached_playlists WHERE playlist_id = ?", (playlist_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def get(self, playlist_id: str, snapshot_id: str) -> Optional[List[Track]]:
+        """Return the cached tracks if cached at `snapshot_id`, else None."""
+        if not self._touch(playlist_id, snapshot_id):
+            return None
+        return list(self._iter_tracks(playlist_id))
+
+    def identities(self, playlist_id: str, snapshot_id: str) -> Optional[IdentityIndex]:
+        """Return an IdentityIndex of the cached tracks if cached at `snapshot_id`, else None."""
+        if not self._touch(playlist_id, snapshot_id):
+            return None
+        return IdentityIndex(self._iter_tracks(playlist_id))
+
+    def put(self, playlist_id: str, snapshot_id: str, tracks: Iterable[Track]):
+        """Store the full contents of a playlist at `snapshot_id`.
+
+        `tracks` may be a generator; rows are written as it is consumed and
+        nothing is stored if it raises part way.
+        """
+        if not snapshot_id:
+            return
+        try:
+            self.conn.execute("DELETE FROM cached_playlist_tracks WHERE playlist_id = ?", (playlist_id,))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cached_playlists (playlist_id, snapshot_id, last_used) VALUES (?, ?, ?)",
+                (playlist_id, snapshot_id, time.time()),
+            )
+            self._insert_tracks(playlist_id, 0, tracks)
+            self._evict()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        self.conn.commit()
+
+    def append(self, playlist_id: str, old_snapshot_id: str, new_snapshot_id: str, tracks: List[Track]):
+        """Record tracks we appended ourselves, moving the entry to the new snapshot.
+
+        Only applies if the playlist was cached at `old_snapshot_id`; otherwise
+        the cache can't know the full contents and the entry is dropped.
+        """
+        if not new_snapshot_id or self.snapshot(playlist_id) != old_snapshot_id:
+            self.invalidate(playlist_id)
+            return
+        start = self.conn.execute(
+            "SELECT COUNT(*) FROM cached_playlist_tracks WHERE playlist_id = ?", (playlist_id,)
+        ).fetchone()[0]
+        self._insert_tracks(playlist_id, start, tracks)
+        self.conn.execute(
+            "UPDATE cached_playlists SET snapshot_id = ?, last_used = ? WHERE playlist_id = ?",
+            (new_snapshot_id, time.time(), playlist_id),
+        )
+        self.conn.commit()
+
+    def insert(self, playlist_id: str, old_snapshot_id: str, new_snapshot_id: str, tracks: List[Track],
+               position: Optional[int] = None):
+        """Record tracks we inserted ourselves at `position` (appended if None), like append()."""
+        if position is None:
+            self.append(playlist_id, old_snapshot_id, new_snapshot_id, tracks)
+            return
+        if not new_snapshot_id or self.snapshot(playlist_id) != old_snapshot_id:
+            self.invalidate(playlist_id)
+            return
+        tracks = list(tracks)
+        # Shift the later rows out of the way through negative positions, so no key ever collides
+        self.conn.execute(
+            "UPDATE cached_playlist_tracks SET position = -1 - (position + ?) WHERE playlist_id = ? AND position >= ?",
+            (len(tracks), playlist_id, position),
+        )
+        self.conn.execute(
+            "UPDATE cached_playlist_tracks SET position = -1 - position WHERE playlist_id = ? AND position < 0",
+            (playlist_id,),
+        )
+        count = self.conn.execute(
+            "SELECT COUNT(*) FROM cached_playlist_tracks WHERE playlist_id = ? AND position < ?", (playlist_id, position)
+        ).fetchone()[0]
+        self._insert_tracks(playlist_id, count, tracks)
+        self.conn.execute(
+            "UPDATE cached_playlists SET snapshot_id = ?, last_used = ? WHERE playlist_id = ?",
+            (new_snapshot_id, time.time(), playlist_id),
+        )
+        self.conn.commit()
+
+    def invalidate(self, playlist_id: str):
+        self.conn.execute("DELETE FROM cached_playlist_tracks WHERE playlist_id = ?", (playlist_id,))
+        self.conn.execute("DELETE FROM cached_playlists WHERE playlist_id = ?", (playlist_id,))
+        self.conn.commit()
+
+    def _touch(self, playlist_id, snapshot_id) -> bool:
+        """Mark the entry as used if it is cached at `snapshot_id`; return whether it is."""
+        if not snapshot_id or self.snapshot(playlist_id) != snapshot_id:
+            return False
+        self.conn.execute(
+            "UPDATE cached_playlists SET last_used = ? WHERE playlist_id = ?", (time.time(), playlist_id)
+        )
+        self.conn.commit()
+        return True
+
+    def _iter_tracks(self, playlist_id):
+        rows = self.conn.execute(
+            "SELECT name, uri, artists, added_at, isrc, duration_ms FROM cached_playlist_tracks"
+            " WHERE playlist_id = ? ORDER BY position",
+            (playlist_id,),
+        )
+        for name, uri, artists, added_at, isrc, duration_ms in rows:
+            yield Track(name, uri, load_artists(artists), added_at, isrc, duration_ms)
+
+    def _insert_tracks(self, playlist_id, start, tracks):
+        self.conn.executemany(
+            "INSERT INTO cached_playlist_tracks (playlist_id, position, name, uri, artists, added_at, isrc, duration_ms)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            ((playlist_id, start + i, t['name'], t['uri'], dump_artists(t), t['added_at'], t.get('isrc'), t.get('duration_ms'))
+             for i, t in enumerate(tracks)),
+        )
+
+    def _evict(self):
+        stale = self.conn.execute(
+            "SELECT playlist_id FROM cached_playlists ORDER BY last_used DESC LIMIT -1 OFFSET ?",
+            (self.max_playlists,),
+        ).fetchall()
+        for (playlist_id,) in stale:
+            self.conn.execute("DELETE FROM cached_playlist_tracks WHERE playlist_id = ?", (playlist_id,))
+            self.conn.execute("DELETE FROM cached_playlists WHERE playlist_id = ?", (playlist_id,))
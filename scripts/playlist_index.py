@@ -0,0 +1,250 @@
+# scripts/playlist_index.py
+
+"""
+Cross-playlist track index
+Crawls every editable playlist and keeps an inverted index (track -> the
+playlists containing it) in the library database. Only playlists whose
+`snapshot_id` changed since the last crawl are fetched again, and all
+questions about the index are answered locally, without any request.
+"""
+
+import os
+import re
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional
+
+from .spotify_utils import *
+from .spotify_async import getManyPlaylistItems
+from .colors import *
+from . import localServer
+from .library_store import LIBRARY_DB, LibraryStore, sync_liked_songs
+from .tracks import load_artists
+
+# Playlists fetched per round of a crawl (bounds how many listings are held at once)
+CRAWL_BATCH = int(os.getenv('SPOTIFY_CRAWL_BATCH', 50))
+
+_TRACK_REF = re.compile(r'(?:spotify:track:|open\.spotify\.com/(?:intl-\w+/)?track/)?([A-Za-z0-9]{22})')
+
+
+def parse_track_ref(ref: str) -> Optional[str]:
+    """Turn a track URI, open.spotify.com link or bare id into a `spotify:track:` URI."""
+    ref = (ref or '').strip()
+    if ref.startswith('spotify:') and not ref.startswith('spotify:track:'):
+        return ref
+    match = _TRACK_REF.search(ref)
+    return f"spotify:track:{match.group(1)}" if match else None
+
+
+class PlaylistIndex:
+    """SQLite inverted index from track URI to the playlists that contain it.
+
+    Each indexed playlist is stored with the `snapshot_id` its contents were
+    read at, so a crawl can skip every playlist that hasn't changed. Lives in
+    the same database as the LibraryStore so liked songs can be joined
+    against it.
+    """
+
+    def __init__(self, path: str = LIBRARY_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS indexed_playlists ("
+            " playlist_id TEXT PRIMARY KEY, name TEXT, snapshot_id TEXT, tracks INTEGER)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS playlist_index ("
+            " uri TEXT, playlist_id TEXT, occurrences INTEGER,"
+            " PRIMARY KEY (uri, playlist_id)) WITHOUT ROWID"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS playlist_index_playlist ON playlist_index(playlist_id)")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def snapshots(self) -> Dict[str, str]:
+        """Return {playlist_id: snapshot_id} for every indexed playlist."""
+        return dict(self.conn.execute("SELECT playlist_id, snapshot_id FROM indexed_playlists"))
+
+    def playlists(self) -> List[Dict[str, Any]]:
+        """Return the indexed playlists as {'id', 'name', 'snapshot_id', 'tracks'} (distinct tracks)."""
+        rows = self.conn.execute("SELECT playlist_id, name, snapshot_id, tracks FROM indexed_playlists ORDER BY name")
+        return [{'id': pid, 'name': name, 'snapshot_id': snap, 'tracks': tracks} for pid, name, snap, tracks in rows]
+
+    def stale(self, playlists: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Return the playlists (from getPlaylists) whose contents aren't indexed at their current snapshot."""
+        known = self.snapshots()
+        return [pl for pl in playlists if not pl.get('snapshot_id') or known.get(pl['id']) != pl['snapshot_id']]
+
+    def replace(self, playlist: Dict[str, Any], uris: Iterable[str]):
+        """Index a playlist's full contents at its current snapshot_id, replacing what was there."""
+        counts = {}
+        for uri in uris:
+            if uri:
+                counts[uri] = counts.get(uri, 0) + 1
+        try:
+            self.conn.execute("DELETE FROM playlist_index WHERE playlist_id = ?", (playlist['id'],))
+            self.conn.executemany(
+                "INSERT INTO playlist_index (uri, playlist_id, occurrences) VALUES (?, ?, ?)",
+                ((uri, playlist['id'], n) for uri, n in counts.items()),
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO indexed_playlists (playlist_id, name, snapshot_id, tracks) VALUES (?, ?, ?, ?)",
+                (playlist['id'], playlist.get('name'), playlist.get('snapshot_id'), len(counts)),
+            )
+        except BaseException:
+            self.conn.rollback()
+            raise
+        self.conn.commit()
+
+    def remove(self, playlist_ids: Iterable[str]):
+        """Drop playlists (deleted, unfollowed or no longer editable) from the index."""
+        playlist_ids = [(pid,) for pid in playlist_ids]
+        self.conn.executemany("DELETE FROM playlist_index WHERE playlist_id = ?", playlist_ids)
+        self.conn.executemany("DELETE FROM indexed_playlists WHERE playlist_id = ?", playlist_ids)
+        self.conn.commit()
+
+    def playlists_containing(self, uri: str) -> List[Dict[str, Any]]:
+        """Return {'id', 'name', 'occurrences'} for every indexed playlist containing `uri`."""
+        rows = self.conn.execute(
+            "SELECT p.playlist_id, p.name, i.occurrences FROM playlist_index i"
+            " JOIN indexed_playlists p ON p.playlist_id = i.playlist_id"
+            " WHERE i.uri = ? ORDER BY p.name",
+            (uri,),
+        )
+        return [{'id': pid, 'name': name, 'occurrences': n} for pid, name, n in rows]
+
+    def liked_not_in_playlists(self) -> List[Track]:
+        """Return the liked songs (from the LibraryStore) that are in no indexed playlist, newest first."""
+        rows = self.conn.execute(
+            "SELECT name, uri, artists, added_at FROM liked_tracks l"
+            " WHERE NOT EXISTS (SELECT 1 FROM playlist_index i WHERE i.uri = l.uri)"
+            " ORDER BY added_at DESC"
+        )
+        return [Track(name, uri, load_artists(artists), added_at) for name, uri, artists, added_at in rows]
+
+    def subset_playlists(self) -> List[Dict[str, Any]]:
+        """Return every pair of playlists where all tracks of one are also in the other.
+
+        Entries are {'subset', 'superset', 'tracks', 'equal'} with playlist
+        dicts ('id', 'name', 'tracks'). Playlists with the same tracks are
+        reported once with 'equal' set. Empty playlists are left out.
+        """
+        rows = self.conn.execute(
+            "SELECT a.playlist_id, b.playlist_id FROM playlist_index a"
+            " JOIN playlist_index b ON b.uri = a.uri AND b.playlist_id != a.playlist_id"
+            " JOIN indexed_playlists p ON p.playlist_id = a.playlist_id"
+            " GROUP BY a.playlist_id, b.playlist_id"
+            " HAVING COUNT(*) = MAX(p.tracks)"
+        ).fetchall()
+        playlists = {pl['id']: pl for pl in self.playlists()}
+        pairs = []
+        for sub, sup in rows:
+            equal = playlists[sub]['tracks'] == playlists[sup]['tracks']
+            if equal and sub > sup:
+                continue
+            pairs.append({'subset': playlists[sub], 'superset': playlists[sup],
+                          'tracks': playlists[sub]['tracks'], 'equal': equal})
+        pairs.sort(key=lambda pair: (-pair['tracks'], pair['subset']['name'] or ''))
+        return pairs
+
+
+def crawl_playlists(access_token: str, index: PlaylistIndex, playlists: List[Dict[str, Any]] = None,
+                    batch_size: int = CRAWL_BATCH) -> Dict[str, int]:
+    """Bring the index up to date with the user's editable playlists.
+
+    Only playlists whose snapshot_id changed are fetched (track URIs only),
+    `batch_size` at a time, all pages of a batch concurrently. Playlists
+    that are gone are removed. Returns {'fetched', 'unchanged', 'removed'}.
+    Raises SpotifyAPIError if the playlists can't be listed or fetched.
+    """
+    if playlists is None:
+        listing = getPlaylists(access_token)
+        if not listing or 'items' not in listing:
+            raise SpotifyAPIError("Failed to fetch playlists")
+        playlists = listing['items']
+    current = {pl['id'] for pl in playlists}
+    removed = [pid for pid in index.snapshots() if pid not in current]
+    index.remove(removed)
+
+    stale = index.stale(playlists)
+    for start in range(0, len(stale), max(1, batch_size)):
+        batch = stale[start:start + batch_size]
+        listings = getManyPlaylistItems(access_token, [pl['id'] for pl in batch], fields=TRACK_URI_FIELDS)
+        for playlist in batch:
+            index.replace(playlist, (track.uri for track in listings[playlist['id']]))
+        print(f"Indexed {min(start + batch_size, len(stale))}/{len(stale)} changed playlists")
+    return {'fetched': len(stale), 'unchanged': len(playlists) - len(stale), 'removed': len(removed)}
+
+
+def print_index_summary(index: PlaylistIndex):
+    playlists = index.playlists()
+    orphans = index.liked_not_in_playlists()
+    subsets = index.subset_playlists()
+    print(f"\n{green}Indexed {len(playlists)} playlists{clear}")
+    print(f"  {cyan}{len(orphans)}{clear} liked songs are in no playlist")
+    print(f"  {cyan}{len(subsets)}{clear} playlists are contained in another playlist")
+
+
+def main(query: str = None, argument: str = None, quiet: bool = False, full_sync: bool = False):
+    """Crawl the playlists into the index (query None), or answer a query from the index.
+
+    Queries run offline: 'contains <track>', 'orphans', 'subsets' and 'stats'.
+    """
+    if query is None:
+        localServer.set_quiet(quiet)
+        access_token = get_or_refresh_access_token(interactive=True)
+        if not access_token:
+            print(f"{red}Failed to get access token{clear}")
+            return
+        store = LibraryStore()
+        index = PlaylistIndex()
+        try:
+            print(f"\n{blue}Syncing your liked songs...{clear}")
+            sync_liked_songs(access_token, store, full=full_sync)
+            print(f"\n{blue}Crawling your playlists...{clear}")
+            stats = crawl_playlists(access_token, index)
+            print(f"{darkgreen}OK:{clear} {stats['fetched']} playlists fetched, "
+                  f"{stats['unchanged']} unchanged, {stats['removed']} removed")
+            print_index_summary(index)
+        except SpotifyAPIError as e:
+            print(f"{red}{e}{clear}")
+        finally:
+            store.close()
+            index.close()
+        return
+
+    # Make sure the liked songs table exists even if nothing was synced yet
+    LibraryStore().close()
+    index = PlaylistIndex()
+    try:
+        if not index.snapshots():
+            print(f"{yellow}The index is empty; run with --crawl first{clear}")
+        if query == 'contains':
+            uri = parse_track_ref(argument)
+            if not uri:
+                print(f"{red}Not a track URI, link or id: {argument}{clear}")
+                return
+            found = index.playlists_containing(uri)
+            print(f"\n{green}{uri} is in {len(found)} playlists{clear}")
+            for playlist in found:
+                times = f" ({playlist['occurrences']}x)" if playlist['occurrences'] > 1 else ''
+                print(f"  {cyan}{playlist['name']}{clear} {black}{playlist['id']}{clear}{times}")
+        elif query == 'orphans':
+            orphans = index.liked_not_in_playlists()
+            print(f"\n{green}{len(orphans)} liked songs are in no playlist{clear}")
+            for song in orphans:
+                print(f"  {song.name} {black}- {song.artists}{clear}")
+        elif query == 'subsets':
+            pairs = index.subset_playlists()
+            print(f"\n{green}{len(pairs)} playlists are contained in another playlist{clear}")
+            for pair in pairs:
+                relation = '=' if pair['equal'] else 'is in'
+                print(f"  {cyan}{pair['subset']['name']}{clear} ({pair['tracks']} tracks) {relation} "
+                      f"{cyan}{pair['superset']['name']}{clear} ({pair['superset']['tracks']} tracks)")
+        elif query == 'stats':
+            print_index_summary(index)
+        else:
+            print(f"{red}Unknown index query '{query}' (use contains, orphans, subsets or stats){clear}")
+    finally:
+        index.close()
@@ -0,0 +1,97 @@
+# scripts/progress.py
+
+import os
+import sys
+import threading
+import time
+from typing import Callable, List
+
+# Most redraws per second of a progress bar
+PROGRESS_HZ = float(os.getenv('SPOTIFY_PROGRESS_HZ', 10))
+
+# Called as callback(label, done, total) on every update, whether or not a
+# bar is drawn. Lets a wrapper (GUI, logger, ...) follow long fetches.
+_callbacks: List[Callable[[str, int, int], None]] = []
+
+# Set to False to suppress every terminal bar (e.g. when several runs share one terminal)
+_bars_enabled = True
+
+
+def add_progress_callback(callback: Callable[[str, int, int], None]):
+    _callbacks.append(callback)
+
+
+def remove_progress_callback(callback: Callable[[str, int, int], None]):
+    if callback in _callbacks:
+        _callbacks.remove(callback)
+
+
+def set_bars_enabled(enabled: bool):
+    """Turn terminal progress bars on or off globally; callbacks are unaffected."""
+    global _bars_enabled
+    _bars_enabled = enabled
+
+
+class Progress:
+    """Terminal progress bar updated once per page rather than once per item.
+
+    Redraws are throttled to `hz` per second and the bar is only drawn when
+    the stream is a TTY (or `enabled` is forced), so piping output to a file
+    or CI log costs nothing. Registered callbacks still see every update.
+
+        with Progress("liked songs") as progress:
+            for page in pages:
+                progress.update(len(page), total)
+    """
+
+    def __init__(self, label: str = "", enabled: bool = None, width: int = 40, hz: float = PROGRESS_HZ,
+                 stream=None):
+        self.label = label
+        self.stream = stream or sys.stdout
+        if enabled is None:
+            enabled = _bars_enabled and hasattr(self.stream, 'isatty') and self.stream.isatty()
+        self.enabled = enabled
+        self.width = width
+        self.min_interval = 1.0 / hz if hz > 0 else 0.0
+        self.done = 0
+        self.total = 0
+        self.last_draw = 0.0
+        self.drawn = False
+        self.lock = threading.Lock()
+
+    def update(self, count: int, total: int = None):
+        """Record `count` more items done (and the latest known total)."""
+        with self.lock:
+            self.done += count
+            if total is not None:
+                self.total = total
+            done, total = self.done, self.total
+            draw = self.enabled and time.monotonic() - self.last_draw >= self.min_interval
+            if draw:
+                self._draw()
+        for callback in list(_callbacks):
+            callback(self.label, done, total)
+
+    def close(self):
+        """Draw the final state and end the line (only if anything was drawn)."""
+        with self.lock:
+            if self.drawn:
+                self._draw()
+                self.stream.write("\n")
+                self.stream.flush()
+                self.drawn = False
+
+    def _draw(self):
+        total = self.total or max(self.done, 1)
+        filled = min(self.width, int(self.done / total * self.width))
+        self.stream.write(f"\r[{'#' * filled}{'-' * (self.width - filled)}] {self.done}/{self.total}")
+        self.stream.flush()
+        self.last_draw = time.monotonic()
+        self.drawn = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
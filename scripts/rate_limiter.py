@@ -0,0 +1,118 @@
+# scripts/rate_limiter.py
+
+import random
+import threading
+import time
+
+import requests
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting requests to `rate` per second.
+
+    `capacity` is the burst size (defaults to one second worth of tokens).
+    A rate of 0 or less disables limiting.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and take it."""
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def try_acquire(self) -> float:
+        """Take a token if one is available and return 0, else return the seconds to wait.
+
+        Lets callers that must not block (e.g. asyncio code) share the bucket
+        with threads by sleeping in their own way and trying again.
+        """
+        with self.lock:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            if self.rate <= 0:
+                return 0.0
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for `seconds` (used when the API says Retry-After)."""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.tokens = 0
+            self.updated = self.blocked_until
+
+
+class RequestScheduler:
+    """Sends requests under a shared rate limit and retries transient failures.
+
+    - 429 responses pause the whole bucket for the `Retry-After` duration, so
+      every thread backs off together instead of hammering the API.
+    - 5xx responses and connection errors are retried with jittered
+      exponential backoff, but only for idempotent requests.
+    - With `hourly_budget`, at most that many requests are sent per hour;
+      further requests wait for the budget to refill.
+    """
+
+    def __init__(self, max_rps: float = 10, burst: float = None, max_retries: int = 5,
+                 backoff_base: float = 0.5, backoff_max: float = 30.0, hourly_budget: int = None):
+        self.bucket = TokenBucket(max_rps, burst)
+        # Optional second bucket capping requests per hour (refills continuously)
+        self.hourly_bucket = TokenBucket(hourly_budget / 3600, hourly_budget) if hourly_budget else None
+        self.sent = 0
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff delay for the given attempt number."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def retry_after(self, response, attempt: int) -> float:
+        try:
+            return max(0.0, float(response.headers.get('Retry-After')))
+        except (TypeError, ValueError):
+            return self.backoff(attempt)
+
+    def send(self, send_func, idempotent: bool = True):
+        """Call `send_func()` (which returns a response) until it succeeds or retries run out.
+
+        The last response is returned as-is once retries are exhausted, so the
+        caller still decides how to report the failure.
+        """
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            if self.hourly_bucket is not None:
+                self.hourly_bucket.acquire()
+            self.bucket.acquire()
+            self.sent += 1
+            try:
+                response = send_func()
+            except (requests.ConnectionError, requests.Timeout):
+                if last_attempt or not idempotent:
+                    raise
+                time.sleep(self.backoff(attempt))
+                continue
+
+            if response.status_code == 429 and not last_attempt:
+                self.bucket.pause(self.retry_after(response, attempt))
+                continue
+            if response.status_code >= 500 and idempotent and not last_attempt:
+                time.sleep(self.backoff(attempt))
+                continue
+            return response
+        return response
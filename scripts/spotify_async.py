@@ -0,0 +1,347 @@
+# scripts/spotify_async.py
+
+"""
+asyncio counterpart of the API helpers in spotify_utils
+Lets thousands of page requests (many playlists, many accounts) be in flight
+on one thread instead of one thread per request. Needs the optional `aiohttp`
+package; without it AIOHTTP_AVAILABLE is False and the sync helpers in
+spotify_utils are used as before.
+
+Requests go through the same token buckets as the sync scheduler, so the
+rate limit and hourly budget are shared with everything else in the process,
+and tokens come from (and are saved through) the same token managers.
+
+    async with AsyncSpotifyClient(access_token) as client:
+        playlists = await client.getPlaylists()
+        items = await client.getPlaylistItemsDetailed(playlists['items'][0]['id'])
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    aiohttp = None
+    AIOHTTP_AVAILABLE = False
+
+from . import spotify_utils as su
+from .spotify_utils import (SpotifyAPIError, Track, TRACK_LIST_FIELDS, DEFAULT_HEADERS, FETCH_WORKERS,
+                            get_scheduler, get_token_manager, _managerForToken, _tokensFromResponse,
+                            getPlaylistItemsDetailed)
+from .progress import Progress
+from .rate_limiter import RequestScheduler
+from . import colors as c
+
+# Most requests in flight at once per client (and open connections)
+ASYNC_CONCURRENCY = int(os.getenv('SPOTIFY_ASYNC_CONCURRENCY', 64))
+
+
+class AsyncResponse:
+    """Status, headers and decoded JSON body of a finished request."""
+
+    __slots__ = ('status_code', 'headers', 'data')
+
+    def __init__(self, status_code: int, headers, data):
+        self.status_code = status_code
+        self.headers = headers
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+class AsyncRequestScheduler:
+    """Async version of RequestScheduler.send() on top of a sync scheduler's buckets.
+
+    Waiting for a token, Retry-After pauses and backoff all use
+    asyncio.sleep, while the buckets themselves stay shared with threads.
+    """
+
+    def __init__(self, scheduler: RequestScheduler = None):
+        self.scheduler = scheduler or get_scheduler()
+
+    async def _acquire(self, bucket):
+        while True:
+            wait = bucket.try_acquire()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    async def send(self, send_func, idempotent: bool = True) -> AsyncResponse:
+        """Await `send_func()` until it succeeds or retries run out (see RequestScheduler.send)."""
+        scheduler = self.scheduler
+        for attempt in range(scheduler.max_retries + 1):
+            last_attempt = attempt == scheduler.max_retries
+            if scheduler.hourly_bucket is not None:
+                await self._acquire(scheduler.hourly_bucket)
+            await self._acquire(scheduler.bucket)
+            scheduler.sent += 1
+            try:
+                response = await send_func()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if last_attempt or not idempotent:
+                    raise
+                await asyncio.sleep(scheduler.backoff(attempt))
+                continue
+
+            if response.status_code == 429 and not last_attempt:
+                scheduler.bucket.pause(scheduler.retry_after(response, attempt))
+                continue
+            if response.status_code >= 500 and idempotent and not last_attempt:
+                await asyncio.sleep(scheduler.backoff(attempt))
+                continue
+            return response
+        return response
+
+
+class AsyncSpotifyClient:
+    """asyncio Spotify client for one account.
+
+    `access_token` may be a token from get_or_refresh_access_token (its
+    token manager then supplies refreshed tokens), or pass `token_file` to
+    use that account's stored tokens. A 401 triggers a refresh through the
+    account's token manager, under the same lock the sync helpers use, so
+    one refresh serves every client and thread; the new tokens are saved as
+    usual.
+    At most `concurrency` requests are in flight at a time.
+    """
+
+    def __init__(self, access_token: str = None, token_file: str = None, concurrency: int = ASYNC_CONCURRENCY,
+                 scheduler: RequestScheduler = None):
+        if aiohttp is None:
+            raise ImportError("AsyncSpotifyClient needs the 'aiohttp' package (pip install aiohttp)")
+        self.access_token = access_token
+        self.manager = _managerForToken(access_token) if access_token else get_token_manager(token_file)
+        self.concurrency = max(1, concurrency)
+        self.scheduler = AsyncRequestScheduler(scheduler)
+        self.session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+        return False
+
+    async def open(self):
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.concurrency)
+            self.session = aiohttp.ClientSession(connector=connector, headers=DEFAULT_HEADERS)
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    # ---- requests ----
+
+    def _token(self):
+        if self.manager is None:
+            return self.access_token
+        if self.access_token:
+            return self.manager.resolve(self.access_token)
+        return self.manager.access_token
+
+    async def api_request(self, method: str, url: str, authorized: bool = True, **kwargs) -> AsyncResponse:
+        """Send a request under the shared rate limit; a 401 is retried once with a refreshed token."""
+        headers = dict(kwargs.pop('headers', None) or {})
+        idempotent = method.upper() in ('GET', 'HEAD', 'PUT', 'DELETE')
+
+        async def send():
+            async with self._semaphore:
+                async with self.session.request(method, url, headers=headers, **kwargs) as response:
+                    try:
+                        data = await response.json(content_type=None)
+                    except ValueError:
+                        data = None
+                    return AsyncResponse(response.status, response.headers, data)
+
+        token = self._token() if authorized else None
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        response = await self.scheduler.send(send, idempotent=idempotent)
+        if response.status_code == 401 and token:
+            retry_token = await self._handle_unauthorized(token)
+            if retry_token:
+                headers['Authorization'] = f'Bearer {retry_token}'
+                response = await self.scheduler.send(send, idempotent=idempotent)
+        return response
+
+    async def _handle_unauthorized(self, failed_token: str):
+        # The token manager's lock is shared with sync threads, so a 401 seen
+        # by both sides still causes a single refresh
+        if self.manager is None:
+            return None
+        return await asyncio.to_thread(self.manager.handle_unauthorized, failed_token)
+
+    # ---- tokens ----
+
+    async def _requestTokens(self, data: Dict[str, str]):
+        data = dict(data, client_id=su.CLIENT_ID, client_secret=su.CLIENT_SECRET)
+        response = await self.api_request('POST', su.TOKEN_URL, authorized=False, data=data)
+        if response.status_code != 200 or not response.json():
+            return None
+        return response.json()
+
+    async def get_access_token(self, auth_code: str, token_file: str = None):
+        """Exchange an authorization code for tokens and make them this client's tokens."""
+        token_data = await self._requestTokens({
+            'grant_type': 'authorization_code',
+            'code': auth_code,
+            'redirect_uri': su.REDIRECT_URI,
+        })
+        if not token_data:
+            print(f"{c.red}Failed to get access token{c.clear}")
+            return None
+        self.manager = get_token_manager(token_file)
+        self.manager.set_tokens(_tokensFromResponse(token_data))
+        self.manager.start()
+        self.access_token = self.manager.access_token
+        return self.access_token
+
+    async def refresh_access_token(self):
+        """Refresh through the token manager without blocking the event loop. Returns the new access token or None."""
+        if self.manager is None:
+            return None
+        return await asyncio.to_thread(self.manager.refresh)
+
+    # ---- listings ----
+
+    async def _fetchPage(self, url: str, offset: int, limit: int, fields: str = None):
+        params = {'limit': limit, 'offset': offset}
+        if fields:
+            params['fields'] = fields
+        response = await self.api_request('GET', url, params=params)
+        if response.status_code != 200:
+            return response.status_code, None
+        return response.status_code, response.json()
+
+    async def _collectPages(self, url: str, limit: int, error_label: str, fields: str = None,
+                            progress: Progress = None, convert: Callable[[Dict], Any] = None) -> List[Any]:
+        """Fetch every page of a paged endpoint, in offset order.
+
+        The first page gives `total`; all other pages are then requested at
+        once and limited only by the client's concurrency. With `convert`,
+        each page is replaced by convert(page) as soon as it arrives, so the
+        raw JSON is never held for more than the requests in flight. Raises
+        SpotifyAPIError if a page still fails after retries.
+        """
+        total = 0
+
+        async def page(offset):
+            nonlocal total
+            status, data = await self._fetchPage(url, offset, limit, fields)
+            if data is None:
+                raise SpotifyAPIError(f"Error fetching {error_label}: {status}", status)
+            total = data.get('total', 0)
+            if progress is not None:
+                progress.update(len(data.get('items', [])), total)
+            return convert(data) if convert is not None else data
+
+        first = await page(0)
+        tasks = [asyncio.ensure_future(page(offset)) for offset in range(limit, total, limit)]
+        try:
+            rest = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        return [first] + list(rest)
+
+    async def _collectTracks(self, url: str, limit: int, error_label: str, fields: str = None,
+                             show_progress: bool = True) -> List[Track]:
+        def to_tracks(data):
+            return [track for track in map(Track.from_item, data.get('items', [])) if track is not None]
+
+        tracks = []
+        with Progress(error_label, enabled=None if show_progress else False) as progress:
+            for page in await self._collectPages(url, limit, error_label, fields, progress, to_tracks):
+                tracks.extend(page)
+        return tracks
+
+    async def getPlaylists(self):
+        """Fetch all playlists the current user can edit (owned or collaborative)."""
+        response = await self.api_request('GET', f"{su.API_BASE_URL}/me")
+        if response.status_code != 200:
+            print(f"{c.red}Failed to retrieve current user. Status {response.status_code}{c.clear}")
+            return None
+        user_id = response.json().get('id')
+        try:
+            pages = await self._collectPages(f"{su.API_BASE_URL}/me/playlists", 50, "playlists")
+        except SpotifyAPIError as e:
+            print(f"{c.red}Failed to retrieve playlists. Status {e.status_code}{c.clear}")
+            return None
+        editable = [pl for data in pages for pl in data.get('items', [])
+                    if (pl.get('owner') or {}).get('id') == user_id or pl.get('collaborative')]
+        return {'items': editable}
+
+    async def getPlaylistSnapshot(self, playlist_id: str):
+        response = await self.api_request('GET', f"{su.API_BASE_URL}/playlists/{playlist_id}",
+                                          params={'fields': 'id,name,snapshot_id,tracks.total'})
+        if response.status_code != 200:
+            raise SpotifyAPIError(f"Error fetching playlist {playlist_id}: {response.status_code}",
+                                  response.status_code)
+        return response.json()
+
+    async def getLikedSongDetails(self, show_progress: bool = True) -> List[Track]:
+        """Return the liked songs as Track records (newest first). Raises SpotifyAPIError on failure."""
+        return await self._collectTracks(f"{su.API_BASE_URL}/me/tracks", 50, "liked songs",
+                                         show_progress=show_progress)
+
+    async def getPlaylistItemsDetailed(self, playlist_id: str, fields: str = TRACK_LIST_FIELDS,
+                                       show_progress: bool = True) -> List[Track]:
+        """Return a playlist's tracks as Track records, requesting only `fields`."""
+        return await self._collectTracks(f"{su.API_BASE_URL}/playlists/{playlist_id}/tracks", 100,
+                                         "playlist items", fields, show_progress)
+
+    async def addSongsToPlaylist(self, playlist_id: str, track_uris: List[str], journal=None,
+                                 base_snapshot_id: str = None, songs=None, position: int = None):
+        """Add track URIs to a playlist, 100 per request and in order.
+
+        Same contract as spotify_utils.addSongsToPlaylist, sharing its
+        chunking, `position` offsets and journaling (spotify_utils._ChunkedAdd):
+        appends unless `position` is given, and returns the new snapshot_id
+        (True if none was sent) or False.
+        """
+        url = f"{su.API_BASE_URL}/playlists/{playlist_id}/tracks"
+        add = su._ChunkedAdd(track_uris, journal, base_snapshot_id, songs, position)
+        for payload in add.payloads():
+            response = await self.api_request('POST', url, json=payload)
+            if response.status_code not in (200, 201):
+                return add.failed(response.status_code)
+            add.sent(response.json())
+        return add.finish()
+
+
+def getManyPlaylistItems(access_token: str, playlist_ids: List[str], fields: str = TRACK_LIST_FIELDS,
+                         workers: int = FETCH_WORKERS) -> Dict[str, List[Track]]:
+    """Sync facade: fetch several playlists at once. Returns {playlist_id: [Track, ...]}.
+
+    With aiohttp every page of every playlist is multiplexed on one event
+    loop; without it the playlists are fetched by a thread pool. Must not be
+    called from inside a running event loop (await the client instead).
+    Raises SpotifyAPIError if any playlist can't be fetched.
+    """
+    playlist_ids = list(dict.fromkeys(playlist_ids))
+    if not playlist_ids:
+        return {}
+    if not AIOHTTP_AVAILABLE:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {pid: pool.submit(getPlaylistItemsDetailed, access_token, pid, fields=fields,
+                                        show_progress=False) for pid in playlist_ids}
+            return {pid: future.result() for pid, future in futures.items()}
+
+    async def fetch_all():
+        async with AsyncSpotifyClient(access_token) as client:
+            listings = await asyncio.gather(*(client.getPlaylistItemsDetailed(pid, fields, show_progress=False)
+                                              for pid in playlist_ids))
+        return dict(zip(playlist_ids, listings))
+
+    return asyncio.run(fetch_all())
@@ -3,14 +3,23 @@
 import os
 import time
 import requests
+from requests.adapters import HTTPAdapter
 import webbrowser
 from urllib.parse import urlencode
 from dotenv import load_dotenv
 from . import localServer
 from . import helpful_fuctions as h
 from . import colors as c
+from .rate_limiter import RequestScheduler
+from .token_manager import TokenManager
+from .tracks import Track
+from .progress import Progress
 import json
 import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
 
 # Load environment variables
@@ -23,13 +32,152 @@ REDIRECT_URI = 'http://localhost:8888/callback'
 SCOPE = 'playlist-read-private playlist-modify-private playlist-modify-public user-library-read'
 AUTH_URL = 'https://accounts.spotify.com/authorize'
 TOKEN_URL = 'https://accounts.spotify.com/api/token'
-API_BASE_URL = 'https://api.spotify.com/v1'
+# Seconds to wait for the browser login to redirect back
+AUTH_TIMEOUT = 120
+API_BASE_URL = os.getenv('SPOTIFY_API_BASE_URL', 'https://api.spotify.com/v1')
 
 # Simple file-based token storage (stored in user home). For a more secure
 # solution use the OS keyring via the `keyring` package.
 TOKEN_FILE = str(Path.home() / '.spotify_tokens.json')
 
-def get_access_token(auth_code):
+# The token file is read once; afterwards the token lives in memory and is
+# refreshed this many seconds before it expires.
+TOKEN_REFRESH_MARGIN = int(os.getenv('SPOTIFY_TOKEN_REFRESH_MARGIN', 300))
+
+# Shared HTTP session. Every API helper goes through it so connections to the
+# Spotify hosts are kept alive and re-used instead of doing a fresh TCP+TLS
+# handshake for every page.
+POOL_SIZE = int(os.getenv('SPOTIFY_POOL_SIZE', 10))
+DEFAULT_HEADERS = {
+    'Accept': 'application/json',
+    'User-Agent': 'SpotifyPlaylistMerger',
+}
+
+# Number of threads used to fetch the pages of a track listing concurrently.
+FETCH_WORKERS = int(os.getenv('SPOTIFY_FETCH_WORKERS', 8))
+
+# Request scheduling: requests per second (token bucket), burst size and how
+# often a rate-limited or failed request is retried.
+MAX_RPS = float(os.getenv('SPOTIFY_MAX_RPS', 10))
+MAX_RETRIES = int(os.getenv('SPOTIFY_MAX_RETRIES', 5))
+
+# Field filter for track listings: only what the merger actually reads. Note
+# that /me/tracks does not support `fields`, only playlist endpoints do.
+TRACK_LIST_FIELDS = ('items(added_at,track(name,uri,artists(name),duration_ms,external_ids(isrc))),'
+                     'next,total')
+# Just enough to diff against a playlist by identity (uri, ISRC, title/artists/duration)
+TRACK_IDENTITY_FIELDS = 'items(track(name,uri,artists(name),duration_ms,external_ids(isrc))),next,total'
+# Only the URIs
+TRACK_URI_FIELDS = 'items(track(uri)),next,total'
+
+_session = None
+_scheduler = None
+# One token manager per token file (several in batch mode)
+_token_managers = {}
+_token_managers_lock = threading.Lock()
+
+class SpotifyAPIError(Exception):
+    """Raised when a request still fails after the scheduler's retries."""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+def create_session(pool_size: int = POOL_SIZE, headers: dict = None) -> requests.Session:
+    """Create a requests session with a keep-alive connection pool of `pool_size`."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    if headers:
+        session.headers.update(headers)
+    return session
+
+def get_session() -> requests.Session:
+    """Return the shared session, creating it on first use."""
+    global _session
+    if _session is None:
+        _session = create_session()
+    return _session
+
+def configure_session(pool_size: int = POOL_SIZE, headers: dict = None) -> requests.Session:
+    """Replace the shared session, e.g. to grow the pool for concurrent fetching."""
+    global _session
+    if _session is not None:
+        _session.close()
+    _session = create_session(pool_size, headers)
+    return _session
+
+def get_scheduler() -> RequestScheduler:
+    """Return the shared request scheduler, creating it on first use."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = RequestScheduler(max_rps=MAX_RPS, max_retries=MAX_RETRIES)
+    return _scheduler
+
+def configure_scheduler(max_rps: float = MAX_RPS, burst: float = None, max_retries: int = MAX_RETRIES,
+                        hourly_budget: int = None) -> RequestScheduler:
+    """Replace the shared scheduler, e.g. to change the request rate or cap requests per hour."""
+    global _scheduler
+    _scheduler = RequestScheduler(max_rps=max_rps, burst=burst, max_retries=max_retries,
+                                  hourly_budget=hourly_budget)
+    return _scheduler
+
+def get_token_manager(token_file: str = None) -> TokenManager:
+    """Return the token manager for `token_file` (default TOKEN_FILE), loading the file on first use."""
+    token_file = token_file or TOKEN_FILE
+    with _token_managers_lock:
+        manager = _token_managers.get(token_file)
+        if manager is None:
+            manager = TokenManager(_fetchRefreshedTokens, load_tokens(token_file), TOKEN_REFRESH_MARGIN,
+                                   lambda tokens: _writeTokenFile(tokens, token_file))
+            _token_managers[token_file] = manager
+            if manager.access_token:
+                manager.start()
+    return manager
+
+def _managerForToken(access_token):
+    """Return the token manager that issued `access_token`, or None."""
+    for manager in list(_token_managers.values()):
+        if access_token in manager.issued:
+            return manager
+    return None
+
+def api_request(method, url, access_token=None, idempotent=None, **kwargs):
+    """Send a request through the shared session and scheduler.
+
+    Adds the bearer token if given. 429 and (for idempotent requests) 5xx
+    responses are retried by the scheduler before a response is returned.
+    GET, HEAD, PUT and DELETE count as idempotent unless `idempotent` says
+    otherwise; position-based writes pass idempotent=False, since replaying
+    one that already went through would hit the wrong tracks.
+    A token issued by the token manager is swapped for its current one, and
+    a 401 triggers one coordinated refresh and a single retry.
+    """
+    headers = dict(kwargs.pop('headers', None) or {})
+    if idempotent is None:
+        idempotent = method.upper() in ('GET', 'HEAD', 'PUT', 'DELETE')
+    manager = _managerForToken(access_token) if access_token else None
+
+    def send(token):
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        return get_scheduler().send(
+            lambda: get_session().request(method, url, headers=headers, **kwargs),
+            idempotent=idempotent,
+        )
+
+    if manager is not None:
+        access_token = manager.resolve(access_token)
+    response = send(access_token)
+    if response.status_code == 401 and manager is not None:
+        retry_token = manager.handle_unauthorized(access_token)
+        if retry_token:
+            response = send(retry_token)
+    return response
+
+def get_access_token(auth_code, token_file=None):
     data = {
         'grant_type': 'authorization_code',
         'code': auth_code,
@@ -37,34 +185,50 @@ def get_access_token(auth_code):
         'client_id': CLIENT_ID,
         'client_secret': CLIENT_SECRET
     }
-    response = requests.post(TOKEN_URL, data=data)
+    response = api_request('POST', TOKEN_URL, data=data)
     if response.status_code != 200:
         print(f"\033[31mFailed to get access token: {response.status_code}\033[0;0m")
         print(response.json())
         exit(1)
     token_data = response.json()
     # token_data contains access_token, token_type, expires_in, refresh_token (maybe), scope
-    save_tokens_from_response(token_data)
+    save_tokens_from_response(token_data, token_file)
     return token_data.get('access_token')
 
-def refresh_access_token(refresh_token):
+def _fetchRefreshedTokens(refresh_token):
+    """Exchange a refresh token for new tokens. Returns the token dict or None.
+
+    Network errors also give None, so callers (and the background
+    refresher) treat being offline like any other failed refresh.
+    """
     data = {
         'grant_type': 'refresh_token',
         'refresh_token': refresh_token,
         'client_id': CLIENT_ID,
         'client_secret': CLIENT_SECRET
     }
-    response = requests.post(TOKEN_URL, data=data)
-    if response.status_code != 200:
+    try:
+        response = api_request('POST', TOKEN_URL, data=data)
+        if response.status_code != 200:
+            return None
+        token_data = response.json()
+    except (requests.RequestException, ValueError):
         return None
-    token_data = response.json()
     # Spotify may not return a new refresh_token on refresh; keep the old one if missing
     if 'refresh_token' not in token_data:
         token_data['refresh_token'] = refresh_token
-    save_tokens_from_response(token_data)
-    return token_data.get('access_token')
+    return _tokensFromResponse(token_data)
 
-def save_tokens_from_response(token_response: dict):
+def refresh_access_token(refresh_token, token_file=None):
+    tokens = _fetchRefreshedTokens(refresh_token)
+    if not tokens:
+        return None
+    manager = get_token_manager(token_file)
+    manager.set_tokens(tokens)
+    manager.start()
+    return tokens.get('access_token')
+
+def _tokensFromResponse(token_response: dict) -> dict:
     # token_response expected fields: access_token, expires_in, refresh_token
     now = int(time.time())
     data = {}
@@ -74,23 +238,33 @@ def save_tokens_from_response(token_response: dict):
         data['expires_at'] = now + int(expires_in)
     else:
         data['expires_at'] = now + 3600
-    if 'refresh_token' in token_response and token_response.get('refresh_token'):
+    if token_response.get('refresh_token'):
         data['refresh_token'] = token_response.get('refresh_token')
-    else:
-        # Preserve existing refresh_token if present
-        existing = load_tokens()
+    return data
+
+def save_tokens_from_response(token_response: dict, token_file: str = None):
+    """Make a token response the current tokens (in memory and in `token_file`, default TOKEN_FILE)."""
+    data = _tokensFromResponse(token_response)
+    manager = get_token_manager(token_file)
+    if 'refresh_token' not in data:
+        # Preserve the existing refresh_token if present
+        existing = manager.tokens
         if existing and existing.get('refresh_token'):
             data['refresh_token'] = existing.get('refresh_token')
+    manager.set_tokens(data)
+    manager.start()
 
+def _writeTokenFile(tokens: dict, token_file: str):
     try:
-        with open(TOKEN_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f)
+        os.makedirs(os.path.dirname(os.path.abspath(token_file)), exist_ok=True)
+        with open(token_file, 'w', encoding='utf-8') as f:
+            json.dump(tokens, f)
     except Exception:
         pass
 
-def load_tokens():
+def load_tokens(token_file=None):
     try:
-        with open(TOKEN_FILE, 'r', encoding='utf-8') as f:
+        with open(token_file or TOKEN_FILE, 'r', encoding='utf-8') as f:
             return json.load(f)
     except Exception:
         return None
@@ -105,44 +279,69 @@ def token_valid(tokens: dict) -> bool:
     # consider token invalid if expiring within 30 seconds
     return int(time.time()) + 30 < int(expires_at)
 
-def get_or_refresh_access_token(interactive=True):
+def get_or_refresh_access_token(interactive=True, token_file=None, show_dialog=False):
     """Return a valid access token. If possible, refresh using stored refresh
     token. If interactive=True and no valid token, perform full auth flow.
-    """
-    tokens = load_tokens()
-    if token_valid(tokens):
-        return tokens.get('access_token')
 
-    # Try to refresh
-    if tokens and tokens.get('refresh_token'):
-        new_access = refresh_access_token(tokens.get('refresh_token'))
-        if new_access:
-            return new_access
+    The token comes from the in-memory token manager (the token file is only
+    read once per process), which also keeps it refreshed in the background.
+    `token_file` selects another account's token store (default TOKEN_FILE).
+    """
+    access = get_token_manager(token_file).get_token()
+    if access:
+        return access
 
     if not interactive:
         return None
 
-    # Do interactive auth flow
-    # Caller should have started localServer.start_server() before calling this
-    code = get_auth_code_via_browser()
+    # Do interactive auth flow (starts the local callback server for its duration)
+    code = get_auth_code_via_browser(show_dialog=show_dialog)
     if not code:
         return None
-    return get_access_token(code)
+    return get_access_token(code, token_file)
 
 def get_current_user(access_token):
-    headers = {'Authorization': f'Bearer {access_token}'}
-    response = requests.get(f"{API_BASE_URL}/me", headers=headers)
+    response = api_request('GET', f"{API_BASE_URL}/me", access_token)
     if response.status_code == 200:
         return response.json()
     return None
 
-def get_auth_code_via_browser():
+def get_auth_code_via_browser(timeout=AUTH_TIMEOUT, show_dialog=False):
+    """Run the browser login and return the authorization code, or None.
+
+    The local callback server is started for this login only and wakes this
+    call the moment the redirect arrives; it is shut down again afterwards.
+    With show_dialog=True Spotify asks which account to use even if the
+    browser is already logged in (needed to log in several accounts).
+    """
+    localServer.start_server()
+    auth = localServer.begin_auth()
+    try:
+        _openAuthPage(auth.state, show_dialog)
+        print("Waiting for auth code from redirect...")
+        code = auth.wait(timeout)
+    finally:
+        localServer.end_auth(auth)
+        localServer.stop_server()
+
+    if auth.error:
+        print(f"\033[31mAuthorization failed: {auth.error}\033[0;0m")
+        return None
+    if not code:
+        print("\033[31mTimeout: No auth code received.\033[0;0m")
+        return None
+    return code
+
+def _openAuthPage(state, show_dialog=False):
     params = {
         'client_id': CLIENT_ID,
         'response_type': 'code',
         'redirect_uri': REDIRECT_URI,
-        'scope': SCOPE
+        'scope': SCOPE,
+        'state': state,
     }
+    if show_dialog:
+        params['show_dialog'] = 'true'
     auth_url = f"{AUTH_URL}?{urlencode(params)}"
 
     # Create a small launcher HTML that opens the auth URL as a popup. This
@@ -180,23 +379,10 @@ def get_auth_code_via_browser():
         # Fallback: open the auth URL directly
         webbrowser.open(auth_url)
 
-    # Wait for the redirect to set the auth code in localServer
-    print("Waiting for auth code from redirect...")
-    for _ in range(120):  # Timeout after 120 seconds
-        code = localServer.get_auth_code()
-        if code:
-            return code
-        time.sleep(1)
-
-    print("\033[31mTimeout: No auth code received.\033[0;0m")
-    return None
-
 def getPlaylists(accessToken):
     """Fetch all playlists the current user can edit (owned or collaborative)."""
-    headers = {'Authorization': f'Bearer {accessToken}'}
-
     # Get current user ID
-    resp = requests.get(f"{API_BASE_URL}/me", headers=headers)
+    resp = api_request('GET', f"{API_BASE_URL}/me", accessToken)
     if resp.status_code != 200:
         print(f"\033[31mFailed to retrieve current user. Status {resp.status_code}\033[0m")
         return None
@@ -206,7 +392,7 @@ def getPlaylists(accessToken):
     editable = []
     url = f"{API_BASE_URL}/me/playlists?limit=50"
     while url:
-        resp = requests.get(url, headers=headers)
+        resp = api_request('GET', url, accessToken)
         if resp.status_code != 200:
             print(f"\033[31mFailed to retrieve playlists. Status {resp.status_code}\033[0m")
             return None
@@ -220,8 +406,7 @@ def getPlaylists(accessToken):
     return {'items': editable}
 
 def getPlaylistItems(accessToken, UPLID):
-    headers = {'Authorization': f'Bearer {accessToken}'}
-    response = requests.get(f"{API_BASE_URL}/playlists/{UPLID}/tracks", headers=headers)
+    response = api_request('GET', f"{API_BASE_URL}/playlists/{UPLID}/tracks", accessToken)
     if response.status_code == 200:
         return response.json()
     else:
@@ -229,108 +414,307 @@ def getPlaylistItems(accessToken, UPLID):
         print(c.red + f"Error fetching playlist items for playlist {UPLID} - Token {response.status_code}" +c.clear)
         return None
 
-def getLikedSongDetails(access_token):
-    """Return a list of liked songs with details (name, uri, artists, added_at)."""
-    headers = {'Authorization': f'Bearer {access_token}'}
-    url = f"{API_BASE_URL}/me/tracks"
-    songs = []
-    params = {'limit': 50, 'offset': 0}
+def _fetchPage(access_token, url, offset, limit, fields=None):
+    """Fetch one page of a paged endpoint. Returns (status_code, data or None).
 
-    # Fetch the first page to determine total number of items
-    response = requests.get(url, headers=headers, params=params)
+    `fields` is passed as Spotify's field filter on endpoints that support it.
+    """
+    params = {'limit': limit, 'offset': offset}
+    if fields:
+        params['fields'] = fields
+    response = api_request('GET', url, access_token, params=params)
     if response.status_code != 200:
-        print(c.red + f"Error fetching liked songs: {response.status_code}" + c.clear)
-        return songs
-    data = response.json()
-    total = data.get('total', 1)  # Total number of liked songs
-
-    progress = 0
-    while True:
+        return response.status_code, None
+    return response.status_code, response.json()
+
+def _iterPages(access_token, url, limit, workers=FETCH_WORKERS, error_label="items", fields=None):
+    """Yield the pages of a paged endpoint in offset order.
+
+    The first page is fetched on its own to learn `total`. All remaining
+    offsets are then known up front, so with workers > 1 they are requested
+    concurrently and handed back in order as they complete. At most
+    `workers * 2` pages are fetched ahead of the consumer, so memory stays
+    bounded by the page size however long the listing is. Raises
+    SpotifyAPIError if a page still fails after retries, so callers never
+    mistake a partial listing for the full one.
+    """
+    status, data = _fetchPage(access_token, url, 0, limit, fields)
+    if data is None:
+        raise SpotifyAPIError(f"Error fetching {error_label}: {status}", status)
+    yield data
+
+    offsets = range(limit, data.get('total', 0), limit)
+    if workers <= 1 or len(offsets) <= 1:
+        for offset in offsets:
+            status, data = _fetchPage(access_token, url, offset, limit, fields)
+            if data is None:
+                raise SpotifyAPIError(f"Error fetching {error_label}: {status}", status)
+            yield data
+        return
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+    pending = deque()
+    remaining = iter(offsets)
+    try:
+        for offset in islice(remaining, workers * 2):
+            pending.append(pool.submit(_fetchPage, access_token, url, offset, limit, fields))
+        while pending:
+            status, data = pending.popleft().result()
+            if data is None:
+                raise SpotifyAPIError(f"Error fetching {error_label}: {status}", status)
+            for offset in islice(remaining, 1):
+                pending.append(pool.submit(_fetchPage, access_token, url, offset, limit, fields))
+            yield data
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def _iterTrackPages(access_token, url, limit, workers, error_label, fields=None, progress=None, keep_empty=False):
+    """Yield (tracks, total) for every page of a track listing, in order.
+
+    A Progress passed as `progress` is updated once per page. Empty slots
+    (removed or unavailable tracks) are dropped unless `keep_empty`, in
+    which case they stay in as None so list indexes match playlist positions.
+    """
+    for data in _iterPages(access_token, url, limit, workers, error_label, fields):
         items = data.get('items', [])
-        for item in items:
-            track = item.get('track')
-            if not track:
-                continue
-            songs.append({
-                'name': track.get('name'),
-                'uri': track.get('uri'),
-                'artists': ', '.join([artist['name'] for artist in track.get('artists', [])]),
-                'added_at': item.get('added_at', ''),
-            })
-            progress += 1
-            bar = f"[{'#' * int((progress / total) * 40)}{'-' * (40 - int((progress / total) * 40))}]"
-            print(f"\r{bar} {progress}/{total}", end="", flush=True)
-        if data.get('next'):
-            params['offset'] += params['limit']
-            response = requests.get(url, headers=headers, params=params)
-            if response.status_code != 200:
-                print(c.red + f"Error fetching liked songs: {response.status_code}" + c.clear)
-                break
-            data = response.json()
-        else:
-            break
-    print()  # Newline after progress bar
-    return songs
+        tracks = [Track.from_item(item) for item in items]
+        if progress is not None:
+            progress.update(len(items), data.get('total', 0))
+        yield [track for track in tracks if keep_empty or track is not None], data.get('total', 0)
 
-def getPlaylistItemsDetailed(access_token, playlist_id):
-    """Return a list of track dicts with details for a playlist."""
-    headers = {'Authorization': f'Bearer {access_token}'}
-    url = f"{API_BASE_URL}/playlists/{playlist_id}/tracks"
+def _collectTracks(access_token, url, limit, workers, error_label, fields=None, show_progress=True, keep_empty=False):
+    """Fetch every page of a track listing and return a list of Track records."""
     tracks = []
-    params = {'limit': 100, 'offset': 0}
+    with Progress(error_label, enabled=None if show_progress else False) as progress:
+        for page, _ in _iterTrackPages(access_token, url, limit, workers, error_label, fields, progress, keep_empty):
+            tracks.extend(page)
+    return tracks
+
+def getLikedSongsProbe(access_token):
+    """Cheap change check for Liked Songs: one request for the newest item.
 
-    # Fetch the first page to determine total number of items
-    response = requests.get(url, headers=headers, params=params)
+    Returns (total, newest uri, newest added_at).
+    """
+    status, data = _fetchPage(access_token, f"{API_BASE_URL}/me/tracks", 0, 1)
+    if data is None:
+        raise SpotifyAPIError(f"Error fetching liked songs: {status}", status)
+    items = data.get('items') or [{}]
+    newest = items[0]
+    return data.get('total', 0), (newest.get('track') or {}).get('uri'), newest.get('added_at')
+
+def getPlaylistSnapshot(access_token, playlist_id):
+    """Return {'id', 'name', 'snapshot_id', 'tracks': {'total'}} for a playlist in one small request."""
+    response = api_request('GET', f"{API_BASE_URL}/playlists/{playlist_id}", access_token,
+                           params={'fields': 'id,name,snapshot_id,tracks.total'})
     if response.status_code != 200:
-        print(c.red + f"Error fetching playlist items: {response.status_code}" + c.clear)
-        return tracks
-    data = response.json()
-    total = data.get('total', 1)  # Total number of tracks
+        raise SpotifyAPIError(f"Error fetching playlist {playlist_id}: {response.status_code}", response.status_code)
+    return response.json()
 
-    progress = 0
-    while True:
-        items = data.get('items', [])
-        for item in items:
-            track = item.get('track')
-            if not track:
-                continue
-            tracks.append({
-                'name': track.get('name'),
-                'uri': track.get('uri'),
-                'artists': ', '.join([artist['name'] for artist in track.get('artists', [])]),
-                'added_at': item.get('added_at', ''),
-            })
-            progress += 1
-            bar = f"[{'#' * int((progress / total) * 40)}{'-' * (40 - int((progress / total) * 40))}]"
-            print(f"\r{bar} {progress}/{total}", end="", flush=True)
-        if data.get('next'):
-            params['offset'] += params['limit']
-            response = requests.get(url, headers=headers, params=params)
-            if response.status_code != 200:
-                print(c.red + f"Error fetching playlist items: {response.status_code}" + c.clear)
-                break
-            data = response.json()
-        else:
-            break
-    print()  # Newline after progress bar
-    return tracks
+def getLikedSongDetails(access_token, workers=FETCH_WORKERS):
+    """Return a list of liked songs with details (name, uri, artists, added_at).
 
-def addSongsToPlaylist(access_token, playlist_id, track_uris):
-    """Add a list of track URIs to a playlist. Returns True if successful."""
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Content-Type': 'application/json'
-    }
+    Pages after the first are fetched by `workers` threads; use workers=1 to
+    fetch strictly one page at a time. Raises SpotifyAPIError if a page
+    cannot be fetched.
+    """
+    return _collectTracks(access_token, f"{API_BASE_URL}/me/tracks", 50, workers, "liked songs")
+
+def iterLikedSongs(access_token, workers=FETCH_WORKERS, progress=None):
+    """Yield liked songs as Track records (newest first), one page at a time.
+
+    The first tracks are available as soon as the first page arrives and
+    only a few pages are held at once. Stop iterating early to skip the
+    rest of the library; with workers=1 no page is fetched ahead. A
+    Progress passed as `progress` is updated per page.
+    """
+    url = f"{API_BASE_URL}/me/tracks"
+    for page, _ in _iterTrackPages(access_token, url, 50, workers, "liked songs", progress=progress):
+        yield from page
+
+def iterPlaylistItems(access_token, playlist_id, workers=FETCH_WORKERS, fields=TRACK_LIST_FIELDS, progress=None):
+    """Yield a playlist's tracks as Track records in playlist order, one page at a time."""
+    url = f"{API_BASE_URL}/playlists/{playlist_id}/tracks"
+    for page, _ in _iterTrackPages(access_token, url, 100, workers, "playlist items", fields, progress):
+        yield from page
+
+def getPlaylistItemsDetailed(access_token, playlist_id, workers=FETCH_WORKERS, fields=TRACK_LIST_FIELDS,
+                             show_progress=True, keep_empty=False):
+    """Return a list of Track records with details for a playlist.
+
+    Only the fields in `fields` are requested (pass None for full track
+    objects), which keeps each page a fraction of its unfiltered size.
+    Pass show_progress=False when fetching several playlists at once, and
+    keep_empty=True to keep empty slots as None so that the index of each
+    track is its position in the playlist.
+    """
     url = f"{API_BASE_URL}/playlists/{playlist_id}/tracks"
-    # Spotify API allows max 100 tracks per request
-    for i in range(0, len(track_uris), 100):
-        uris = track_uris[i:i+100]
-        payload = {'uris': uris}
-        response = requests.post(url, headers=headers, json=payload)
+    return _collectTracks(access_token, url, 100, workers, "playlist items", fields, show_progress, keep_empty)
+
+def addSongsToPlaylist(access_token, playlist_id, track_uris, journal=None, base_snapshot_id=None, songs=None,
+                       position=None):
+    """Add a list of track URIs to a playlist.
+
+    Returns the playlist's new snapshot_id if successful (True if Spotify
+    did not send one), False otherwise.
+
+    The tracks are appended unless `position` is given, in which case they
+    are inserted so the first one lands at `position` (0 = top), in the
+    order given. Chunk i goes to `position + 100 * i`, right after the
+    chunks before it, so the whole batch takes one request per 100 tracks.
+
+    With a WriteJournal every committed chunk and its snapshot_id is
+    recorded on disk. If the journal already holds an unfinished add of the
+    same URIs, only the chunks after the last committed one are sent (at the
+    journal's position). `base_snapshot_id` and `songs` are stored in a new
+    journal for later bookkeeping.
+    """
+    url = f"{API_BASE_URL}/playlists/{playlist_id}/tracks"
+    add = _ChunkedAdd(track_uris, journal, base_snapshot_id, songs, position)
+    for payload in add.payloads():
+        response = api_request('POST', url, access_token, json=payload)
         if response.status_code not in (200, 201):
-            print(c.red + f"Failed to add tracks: {response.status_code}" + c.clear)
+            return add.failed(response.status_code)
+        add.sent(response.json())
+    return add.finish()
+
+class _ChunkedAdd:
+    """Chunking, position offsets and journaling of one addSongsToPlaylist call.
+
+    Shared by the sync and async clients, which only send the payloads:
+    `payloads()` yields one request body per chunk still to send (marking it
+    in flight), `sent()` / `failed()` record each response and `finish()`
+    closes the journal and returns the result.
+    """
+
+    def __init__(self, track_uris, journal=None, base_snapshot_id=None, songs=None, position=None):
+        self.track_uris = track_uris
+        self.journal = journal
+        self.position = position
+        self.snapshot_id = True
+        self.start = 0
+        if journal is not None:
+            if journal.exists() and journal.uris == list(track_uris):
+                self.start = journal.committed_chunks * journal.chunk_size
+                self.snapshot_id = journal.last_snapshot_id() or True
+                self.position = journal.position
+            else:
+                journal.begin(track_uris, base_snapshot_id, songs, position=position)
+
+    def payloads(self):
+        # Spotify API allows max 100 tracks per request; chunks go one after another since their order matters
+        for i in range(self.start, len(self.track_uris), 100):
+            payload = {'uris': self.track_uris[i:i+100]}
+            if self.position is not None:
+                payload['position'] = self.position + i
+            if self.journal is not None:
+                self.journal.mark_in_flight(i // 100)
+            yield payload
+
+    def sent(self, body):
+        self.snapshot_id = (body or {}).get('snapshot_id') or self.snapshot_id
+        if self.journal is not None:
+            self.journal.commit_chunk(self.snapshot_id if isinstance(self.snapshot_id, str) else None)
+
+    def failed(self, status_code):
+        print(c.red + f"Failed to add tracks: {status_code}" + c.clear)
+        if self.journal is not None:
+            self.journal.clear_in_flight()
+        return False
+
+    def finish(self):
+        if self.journal is not None:
+            self.journal.finish()
+        return self.snapshot_id
+
+def removeSongsAtPositions(access_token, playlist_id, removals, snapshot_id=None):
+    """Remove the tracks at the given playlist positions, 100 positions per request.
+
+    `removals` is a list of (position, uri) pairs for the playlist as it is
+    at `snapshot_id`. Requests go from the highest positions down, so the
+    positions still to be removed never shift, and each request is made
+    against the snapshot_id returned by the previous one. Returns the final
+    snapshot_id (True if Spotify sent none), or False if a request failed.
+    """
+    url = f"{API_BASE_URL}/playlists/{playlist_id}/tracks"
+    removals = sorted(removals, key=lambda removal: removal[0], reverse=True)
+    result = snapshot_id or True
+    for i in range(0, len(removals), 100):
+        positions = {}
+        for position, uri in removals[i:i+100]:
+            positions.setdefault(uri, []).append(position)
+        payload = {'tracks': [{'uri': uri, 'positions': sorted(p)} for uri, p in positions.items()]}
+        if isinstance(result, str):
+            payload['snapshot_id'] = result
+        response = api_request('DELETE', url, access_token, json=payload, idempotent=False)
+        if response.status_code != 200:
+            print(c.red + f"Failed to remove tracks: {response.status_code}" + c.clear)
             return False
-    return True
+        result = response.json().get('snapshot_id') or result
+    return result
+
+def insertSongsAtPosition(access_token, playlist_id, track_uris, position):
+    """Insert up to 100 track URIs so that the first one ends up at `position`.
+
+    Returns the new snapshot_id (True if Spotify sent none), False on failure.
+    """
+    response = api_request('POST', f"{API_BASE_URL}/playlists/{playlist_id}/tracks", access_token,
+                           json={'uris': list(track_uris), 'position': position})
+    if response.status_code not in (200, 201):
+        print(c.red + f"Failed to insert tracks: {response.status_code}" + c.clear)
+        return False
+    return response.json().get('snapshot_id') or True
+
+def reorderPlaylistItems(access_token, playlist_id, range_start, insert_before, range_length=1, snapshot_id=None):
+    """Move `range_length` tracks starting at `range_start` to before position `insert_before`.
+
+    Positions are those before the move. Returns the new snapshot_id (True
+    if Spotify sent none), False on failure.
+    """
+    payload = {'range_start': range_start, 'insert_before': insert_before, 'range_length': range_length}
+    if isinstance(snapshot_id, str):
+        payload['snapshot_id'] = snapshot_id
+    response = api_request('PUT', f"{API_BASE_URL}/playlists/{playlist_id}/tracks", access_token, json=payload,
+                           idempotent=False)
+    if response.status_code not in (200, 201):
+        print(c.red + f"Failed to reorder tracks: {response.status_code}" + c.clear)
+        return False
+    return response.json().get('snapshot_id') or True
+
+def _chunkLanded(access_token, playlist_id, uris, total, position=None):
+    """Return True if the playlist holds exactly `uris` at `position` (at its end if None)."""
+    if position is None:
+        position = total - len(uris)
+    if not uris or position < 0 or total < position + len(uris):
+        return False
+    url = f"{API_BASE_URL}/playlists/{playlist_id}/tracks"
+    status, data = _fetchPage(access_token, url, position, len(uris), 'items(track(uri))')
+    if data is None:
+        raise SpotifyAPIError(f"Error fetching playlist items: {status}", status)
+    found = [(item.get('track') or {}).get('uri') for item in data.get('items', [])]
+    return found == list(uris)
+
+def resumeAddSongs(access_token, journal, playlist=None):
+    """Finish an interrupted journaled add without recomputing the diff.
+
+    If a chunk was in flight when the previous run died and the playlist has
+    changed since the last committed snapshot, the place the chunk was
+    sent to (the end of the playlist for appends) is checked to see whether
+    it landed, so it is neither lost nor
+    added twice. `playlist` is the playlist object from getPlaylists (its
+    snapshot_id and tracks.total are used for that check).
+    """
+    if journal.in_flight is not None and playlist is not None:
+        current = playlist.get('snapshot_id')
+        total = (playlist.get('tracks') or {}).get('total')
+        if current and total is not None and current != journal.last_snapshot_id():
+            size = journal.chunk_size
+            chunk = journal.uris[journal.in_flight * size:(journal.in_flight + 1) * size]
+            position = journal.position + journal.in_flight * size if journal.position is not None else None
+            if _chunkLanded(access_token, journal.playlist_id, chunk, total, position):
+                journal.commit_chunk(current)
+            else:
+                journal.clear_in_flight()
+    return addSongsToPlaylist(access_token, journal.playlist_id, journal.uris, journal)
 
 def printPlaylistData(data):
     if data is not None and isinstance(data, dict):
@@ -360,11 +744,15 @@ def selectDefaultPlaylist(playlists: dict):
 
     Args:
         playlists (list[str]): list of playlists
+
+    Returns:
+        dict | None: the default playlist, or None (after printing why) if it's unset or missing
     """
     
     default_id = os.getenv("DEFAULT_PLAYLIST_ID")
     if default_id is None:
-        raise("Encountered error loading DEFAULT_PLAYLIST_ID from dotenv")
+        print(c.red + "DEFAULT_PLAYLIST_ID is not set in .env" + c.clear)
+        return None
     
     items = playlists.get('items', [])
     if not items:
@@ -374,7 +762,8 @@ def selectDefaultPlaylist(playlists: dict):
     for i in items:
         if i.get("id") == default_id:
             return i
-    return "_DEFAULT_NOT_FOUND_"
+    print(c.red + f"Default playlist {default_id} not found among your playlists." + c.clear)
+    return None
     
 def selectPlaylistInteractively(playlists, supress_inquire=False):
     """Prompt user to select a playlist from a list."""
@@ -9,18 +9,21 @@ import sys
 import json
 from typing import List, Dict, Any, Optional
 from datetime import datetime
+from itertools import islice
 
 from .spotify_utils import *
+from .progress import Progress
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from scripts.colors import green, red, yellow, blue, clear, cyan, magenta
 from scripts.liked_songs_merger import (
-    get_liked_songs_ordered,
-    find_missing_songs,
+    get_target_identities,
+    iter_missing_songs,
     display_song_list,
-    confirm_addition
+    confirm_addition,
+    insert_position
 )
 from main import * 
 import scripts.localServer as localServer
@@ -42,12 +45,10 @@ class TerminalMenu:
         print(f"\n{green}=== Spotify Authentication ==={clear}")
         
         try:
-            # Try to get or refresh tokens. If interactive auth is needed,
-            # start the local server first so the redirect can be received.
-            # get_or_refresh_access_token will perform an interactive flow
-            # if necessary.
-            # Ensure local server is running before interactive auth is attempted.
-            localServer.start_server(quiet=self.quiet)
+            # Try to get or refresh tokens. get_or_refresh_access_token will
+            # perform an interactive flow if necessary; the local callback
+            # server only runs while that login waits for its redirect.
+            localServer.set_quiet(self.quiet)
             self.access_token = get_or_refresh_access_token(interactive=True)
             
             if not self.access_token:
@@ -91,15 +92,6 @@ class TerminalMenu:
             print(f"{red}Please authenticate first{clear}")
             return
             
-        print(f"\n{yellow}Fetching liked songs...{clear}")
-        liked_songs = get_liked_songs_ordered(self.access_token)
-        
-        if not liked_songs:
-            print(f"{red}No liked songs found{clear}")
-            return
-            
-        print(f"{green}Found {len(liked_songs)} liked songs{clear}")
-        
         # Get playlists
         print(f"\n{yellow}Fetching playlists...{clear}")
         playlists = getPlaylists(self.access_token)
@@ -115,29 +107,26 @@ class TerminalMenu:
             print(f"{red}No playlist selected{clear}")
             return
             
-        # Get target playlist songs
+        # Index the target playlist's tracks
         print(f"\n{yellow}Fetching songs from target playlist...{clear}")
-        target_songs = getPlaylistItemsDetailed(self.access_token, target_playlist['id'])
+        target_identities = get_target_identities(self.access_token, target_playlist['id'])
         
-        if target_songs is None:
-            print(f"{red}Failed to fetch target playlist songs{clear}")
-            return
-            
-        # Find missing songs
-        missing_songs = find_missing_songs(liked_songs, target_songs)
+        # Stream liked songs (newest first) past the target to find missing songs
+        print(f"\n{yellow}Fetching liked songs...{clear}")
+        with Progress("liked songs") as progress:
+            missing_reversed = list(iter_missing_songs(iterLikedSongs(self.access_token, progress=progress), target_identities))
         
-        if not missing_songs:
+        if not missing_reversed:
             print(f"{green}All liked songs are already in the target playlist!{clear}")
             return
             
-        print(f"\n{green}Found {len(missing_songs)} songs to add{clear}")
+        print(f"\n{green}Found {len(missing_reversed)} songs to add{clear}")
         
         # Display missing songs (newest first)
-        missing_reversed = list(reversed(missing_songs))
         display_song_list(missing_reversed, f"Songs to add to '{target_playlist['name']}'")
         
         # Confirm addition
-        if not confirm_addition(missing_songs, target_playlist['name']):
+        if not confirm_addition(missing_reversed, target_playlist['name']):
             print(f"{yellow}Operation cancelled{clear}")
             return
             
@@ -145,10 +134,10 @@ class TerminalMenu:
         track_uris = [song['uri'] for song in missing_reversed]
         
         print(f"\n{yellow}Adding songs to playlist...{clear}")
-        success = addSongsToPlaylist(self.access_token, target_playlist['id'], track_uris)
+        success = addSongsToPlaylist(self.access_token, target_playlist['id'], track_uris, position=insert_position())
         
         if success:
-            print(f"{green}Successfully added {len(missing_songs)} songs to '{target_playlist['name']}'{clear}")
+            print(f"{green}Successfully added {len(missing_reversed)} songs to '{target_playlist['name']}'{clear}")
         else:
             print(f"{red}Failed to add songs to playlist{clear}")
     
@@ -159,20 +148,22 @@ class TerminalMenu:
             return
             
         print(f"\n{yellow}Fetching liked songs...{clear}")
-        liked_songs = getLikedSongDetails(self.access_token)
+        # Only the first page is needed for the preview; the total comes from the probe
+        total, _, _ = getLikedSongsProbe(self.access_token)
+        first_songs = list(islice(iterLikedSongs(self.access_token, workers=1), 10))
         
-        if not liked_songs:
+        if not first_songs:
             print(f"{red}No liked songs found{clear}")
             return
             
-        print(f"\n{green}Found {len(liked_songs)} liked songs{clear}")
+        print(f"\n{green}Found {total} liked songs{clear}")
         
         # Display first 10 songs
-        display_count = min(10, len(liked_songs))
-        display_song_list(liked_songs[:display_count], f"First {display_count} liked songs")
+        display_count = len(first_songs)
+        display_song_list(first_songs, f"First {display_count} liked songs")
         
-        if len(liked_songs) > display_count:
-            print(f"\n{yellow}... and {len(liked_songs) - display_count} more songs{clear}")
+        if total > display_count:
+            print(f"\n{yellow}... and {total - display_count} more songs{clear}")
     
     def view_playlists(self):
         """Display user's playlists"""
@@ -221,23 +212,34 @@ class TerminalMenu:
             return
             
         print(f"\n{yellow}Fetching liked songs for backup...{clear}")
-        liked_songs = getLikedSongDetails(self.access_token)
-        
-        if not liked_songs:
-            print(f"{red}No liked songs found{clear}")
-            return
-            
         filename = f"liked_songs_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        count = 0
         
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(liked_songs, f, indent=2, ensure_ascii=False)
-                
-            print(f"{green}Backup saved to: {filename}{clear}")
-            print(f"{green}Backed up {len(liked_songs)} songs{clear}")
-            
+            # Songs are written page by page as they arrive instead of
+            # holding the whole library in memory first
+            with open(filename, 'w', encoding='utf-8') as f, Progress("liked songs") as progress:
+                f.write("[")
+                for song in iterLikedSongs(self.access_token, progress=progress):
+                    f.write(",\n  " if count else "\n  ")
+                    f.write(json.dumps(song.to_dict(), indent=2, ensure_ascii=False).replace("\n", "\n  "))
+                    count += 1
+                f.write("\n]" if count else "]")
+        except SpotifyAPIError as e:
+            print(f"{red}{e}{clear}")
+            os.remove(filename)
+            return
         except Exception as e:
             print(f"{red}Error creating backup: {str(e)}{clear}")
+            return
+            
+        if not count:
+            print(f"{red}No liked songs found{clear}")
+            os.remove(filename)
+            return
+            
+        print(f"{green}Backup saved to: {filename}{clear}")
+        print(f"{green}Backed up {count} songs{clear}")
     
     def settings_menu(self):
         """Display settings options"""
@@ -275,18 +277,22 @@ class TerminalMenu:
             if choice == "0":
                 print(f"\n{green}Thank you for using Spotify Liked Songs Merger!{clear}")
                 break
-            elif choice == "1":
-                self.merge_liked_songs()
-            elif choice == "2":
-                self.view_liked_songs()
-            elif choice == "3":
-                self.view_playlists()
-            elif choice == "4":
-                self.create_new_playlist()
-            elif choice == "5":
-                self.backup_liked_songs()
-            elif choice == "6":
-                self.settings_menu()
+
+            try:
+                if choice == "1":
+                    self.merge_liked_songs()
+                elif choice == "2":
+                    self.view_liked_songs()
+                elif choice == "3":
+                    self.view_playlists()
+                elif choice == "4":
+                    self.create_new_playlist()
+                elif choice == "5":
+                    self.backup_liked_songs()
+                elif choice == "6":
+                    self.settings_menu()
+            except SpotifyAPIError as e:
+                print(f"{red}{e}{clear}")
             
             input(f"\n{yellow}Press Enter to continue...{clear}")
 
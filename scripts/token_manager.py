@@ -0,0 +1,156 @@
+# scripts/token_manager.py
+
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+
+class TokenManager:
+    """Holds the current OAuth tokens in memory and keeps the access token fresh.
+
+    - get_token() returns the in-memory token, refreshing it first if it is
+      about to expire. Refreshes are serialised by a lock and re-checked
+      after acquiring it, so concurrent workers trigger a single refresh.
+    - A background thread refreshes the token `margin` seconds before it
+      expires, so long runs never see it lapse.
+    - handle_unauthorized() is called after a 401: the first caller
+      refreshes, everyone else whose request failed with the same token
+      simply gets the new one.
+
+    `refresh(refresh_token)` must return a token dict ('access_token',
+    'expires_at' and 'refresh_token') or None. `on_update(tokens)` is called
+    with every new token dict, e.g. to persist it.
+    """
+
+    # Seconds after a refresh during which a 401 does not trigger another one
+    MIN_REFRESH_INTERVAL = 10
+
+    def __init__(self, refresh: Callable[[str], Optional[Dict]], tokens: Dict = None, margin: float = 300,
+                 on_update: Callable[[Dict], None] = None):
+        self._refresh = refresh
+        self.tokens = None
+        self.margin = margin
+        self.on_update = on_update
+        self.refreshes = 0
+        self.refreshed_at = float('-inf')
+        self.lock = threading.Lock()
+        # Every access token handed out, so stale copies held by callers can be mapped to the current one
+        self.issued = set()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        if tokens:
+            self._set(tokens, notify=False)
+
+    @property
+    def access_token(self) -> Optional[str]:
+        return (self.tokens or {}).get('access_token')
+
+    def expires_in(self) -> float:
+        """Seconds until the access token expires (negative if expired or missing)."""
+        if not self.access_token:
+            return -1.0
+        return float((self.tokens or {}).get('expires_at', 0)) - time.time()
+
+    def set_tokens(self, tokens: Dict):
+        """Replace the tokens (e.g. after an interactive login)."""
+        with self.lock:
+            self._set(tokens)
+
+    def get_token(self, min_valid: float = 30) -> Optional[str]:
+        """Return an access token valid for at least `min_valid` seconds, refreshing if needed.
+
+        Returns None if there is no token and it can't be refreshed.
+        """
+        if self.expires_in() > min_valid:
+            return self.access_token
+        with self.lock:
+            if self.expires_in() <= min_valid:
+                self._refresh_locked()
+            return self.access_token if self.expires_in() > min_valid else None
+
+    def handle_unauthorized(self, failed_token: str) -> Optional[str]:
+        """Return a token to retry with after `failed_token` got a 401, or None."""
+        with self.lock:
+            current = self.access_token
+            if current and current != failed_token:
+                # Another thread already refreshed since this request was sent
+                return current
+            if time.monotonic() - self.refreshed_at < self.MIN_REFRESH_INTERVAL:
+                # A brand-new token was rejected: refreshing again won't help
+                return None
+            if self._refresh_locked():
+                return self.access_token
+            return None
+
+    def refresh(self) -> Optional[str]:
+        """Refresh now, under the lock. Returns the new access token or None."""
+        with self.lock:
+            return self.access_token if self._refresh_locked() else None
+
+    def resolve(self, token: str) -> str:
+        """Map an access token this manager handed out earlier to the current one."""
+        if token in self.issued and self.access_token:
+            return self.access_token
+        return token
+
+    def start(self):
+        """Start the background refresher (no-op if it is already running)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='token-refresher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _set(self, tokens: Dict, notify: bool = True):
+        self.tokens = dict(tokens)
+        if self.access_token:
+            self.issued.add(self.access_token)
+        if notify and self.on_update is not None:
+            self.on_update(self.tokens)
+        # Let the refresher re-plan around the new expiry
+        self._wake.set()
+
+    def _refresh_locked(self) -> bool:
+        refresh_token = (self.tokens or {}).get('refresh_token')
+        if not refresh_token:
+            return False
+        try:
+            tokens = self._refresh(refresh_token)
+        except Exception:
+            # A failed refresh must never take the refresher thread down with it
+            tokens = None
+        if not tokens:
+            return False
+        if not tokens.get('refresh_token'):
+            tokens = dict(tokens, refresh_token=refresh_token)
+        self._set(tokens)
+        self.refreshes += 1
+        self.refreshed_at = time.monotonic()
+        return True
+
+    def _run(self):
+        while not self._stopped.is_set():
+            if self.access_token:
+                wait = max(1.0, self.expires_in() - self.margin)
+            else:
+                wait = None
+            if self._wake.wait(wait):
+                self._wake.clear()
+                continue
+            with self.lock:
+                if self.expires_in() <= self.margin and not self._refresh_locked():
+                    # Refresh failed (offline, revoked ...); try again shortly
+                    self._wake.clear()
+                    retry = True
+                else:
+                    retry = False
+            if retry:
+                self._stopped.wait(30)
@@ -0,0 +1,141 @@
+# scripts/track_identity.py
+
+"""
+Track identity beyond the URI
+The same recording appears under different URIs (single vs album release,
+regional relinks, re-uploads). Recordings are identified by ISRC; tracks
+without one fall back to a normalized title + artists + duration key.
+"""
+
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional
+
+from .tracks import Track, track_id
+
+# Durations within about this many milliseconds count as the same recording
+DURATION_TOLERANCE_MS = 2000
+
+# "(feat. X)", "[Remastered 2011]", "- 2009 Remaster": annotations that don't change the recording
+_ANNOTATION = re.compile(r'[\(\[][^\)\]]*(?:remaster|feat\.?\s|ft\.\s|featuring\s)[^\)\]]*[\)\]]', re.IGNORECASE)
+_DASH_SUFFIX = re.compile(r'\s+-\s+[^-]*remaster[^-]*$', re.IGNORECASE)
+_FEATURING = re.compile(r'\s+(?:feat\.?|ft\.|featuring)\s.*$', re.IGNORECASE)
+_NON_WORD = re.compile(r'[\W_]+')
+
+# Normalized artist line-ups, keyed by the track's artist names (line-ups repeat a lot)
+_ARTIST_KEYS: Dict[tuple, tuple] = {}
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace."""
+    text = text or ''
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_WORD.sub(' ', text.casefold()).strip()
+
+
+def normalize_artists(names: tuple) -> tuple:
+    key = _ARTIST_KEYS.get(names)
+    if key is None:
+        key = _ARTIST_KEYS.setdefault(names, tuple(sorted(normalize_text(name) for name in names)))
+    return key
+
+
+def normalize_title(name: str) -> str:
+    """Normalize a track title, dropping remaster and featuring annotations.
+
+    Live versions, remixes, edits etc. are left alone: they are different
+    recordings.
+    """
+    name = _ANNOTATION.sub(' ', name or '')
+    name = _DASH_SUFFIX.sub('', name)
+    name = _FEATURING.sub('', name)
+    return normalize_text(name)
+
+
+def normalize_isrc(isrc: Optional[str]) -> Optional[str]:
+    isrc = (isrc or '').replace('-', '').strip().upper()
+    return isrc or None
+
+
+def _fuzzy_base(track: Track):
+    """(title, artists, duration bucket) of a track, or None if name or duration is missing."""
+    if not track.name or not track.duration_ms:
+        return None
+    title = normalize_title(track.name)
+    if not title:
+        return None
+    return title, normalize_artists(track.artist_names), int(track.duration_ms) // DURATION_TOLERANCE_MS
+
+
+def fuzzy_keys(track: Track, neighbours: bool = False) -> List[int]:
+    """Hashed title/artists/duration key of a track ([] if name or duration is missing).
+
+    Durations are bucketed by DURATION_TOLERANCE_MS; with `neighbours` the
+    keys of the adjacent buckets are included too, so lookups tolerate a
+    track sitting just across a bucket edge.
+    """
+    base = _fuzzy_base(track)
+    if base is None:
+        return []
+    title, artists, bucket = base
+    buckets = (bucket - 1, bucket, bucket + 1) if neighbours else (bucket,)
+    return [hash((title, artists, b)) for b in buckets]
+
+
+class IdentityIndex:
+    """Hash sets answering "is an equivalent track already here?" in O(1).
+
+    A track matches if its track id, its ISRC or (when one of the two
+    tracks has no ISRC) its fuzzy key is already in the index. Two tracks
+    with different ISRCs are never matched by the fuzzy key. Only hashes
+    are kept, so indexing 100k tracks stays cheap in time and memory.
+    """
+
+    def __init__(self, tracks: Iterable[Any] = ()):
+        self.ids = set()
+        self.isrcs = set()
+        self.fuzzy = set()
+        # Fuzzy keys of tracks without an ISRC: the only ones a track with an ISRC may match
+        self.fuzzy_without_isrc = set()
+        self.update(tracks)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, track: Any):
+        track = Track.from_dict(track)
+        self._add(track, normalize_isrc(track.isrc))
+
+    def update(self, tracks: Iterable[Any]):
+        for track in tracks:
+            self.add(track)
+
+    def __contains__(self, track: Any) -> bool:
+        track = Track.from_dict(track)
+        return self._find(track, normalize_isrc(track.isrc))
+
+    def add_new(self, track: Any) -> bool:
+        """Add `track` unless an equivalent is already indexed; return whether it was added."""
+        track = Track.from_dict(track)
+        isrc = normalize_isrc(track.isrc)
+        if self._find(track, isrc):
+            return False
+        self._add(track, isrc)
+        return True
+
+    def _find(self, track: Track, isrc: Optional[str]) -> bool:
+        if track_id(track.uri) in self.ids or (isrc and isrc in self.isrcs):
+            return True
+        keys = self.fuzzy_without_isrc if isrc else self.fuzzy
+        return bool(keys) and any(key in keys for key in fuzzy_keys(track, neighbours=True))
+
+    def _add(self, track: Track, isrc: Optional[str]):
+        self.ids.add(track_id(track.uri))
+        if isrc:
+            self.isrcs.add(isrc)
+        for key in fuzzy_keys(track):
+            self.fuzzy.add(key)
+            if not isrc:
+                self.fuzzy_without_isrc.add(key)
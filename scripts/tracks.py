@@ -0,0 +1,135 @@
+# scripts/tracks.py
+
+import json
+import sys
+from typing import Any, Dict, Iterable, Optional
+
+# Artist tuples seen so far, so every track by the same artists shares one tuple
+_ARTIST_GROUPS: Dict[tuple, tuple] = {}
+
+TRACK_URI_PREFIX = 'spotify:track:'
+
+
+def track_id(uri: str) -> str:
+    """Return the 22-character track id for a `spotify:track:` URI.
+
+    Other URIs (local files, episodes) are returned unchanged, so ids and
+    URIs of different kinds never collide in one set.
+    """
+    if uri and uri.startswith(TRACK_URI_PREFIX):
+        return uri[len(TRACK_URI_PREFIX):]
+    return uri
+
+
+def intern_artists(names: Iterable[str]) -> tuple:
+    """Return a shared, interned tuple of a track's artist names.
+
+    Every track with the same line-up shares one tuple (a single artist is a
+    1-tuple), so the real name boundaries are kept: "Tyler, The Creator" is
+    one artist. The joined display string is only built when
+    `Track.artists` is read.
+    """
+    names = tuple(sys.intern(name or '') for name in names)
+    return _ARTIST_GROUPS.setdefault(names, names)
+
+
+def dump_artists(song: Any) -> str:
+    """Artist names of a Track (or track dict) as the JSON list stored in SQLite."""
+    return json.dumps(list(Track.from_dict(song).artist_names), ensure_ascii=False)
+
+
+def load_artists(value: Optional[str]):
+    """Artist names from a stored column: a JSON list, or an older joined string (returned as is)."""
+    if value and value.startswith('['):
+        try:
+            return json.loads(value)
+        except ValueError:
+            pass
+    return value or ''
+
+
+class Track:
+    """Compact record for one listed track (name, uri, artists, added_at, isrc, duration_ms).
+
+    Uses __slots__ and interned artist strings instead of one dict per track,
+    which matters when several 100k-track listings are held at once. Supports
+    the read-only dict access the rest of the code uses (`song['uri']`,
+    `song.get('added_at', '')`); use to_dict() where real JSON is needed.
+    """
+
+    __slots__ = ('name', 'uri', '_artists', 'added_at', 'isrc', 'duration_ms')
+
+    FIELDS = ('name', 'uri', 'artists', 'added_at', 'isrc', 'duration_ms')
+
+    def __init__(self, name: str, uri: str, artists: Any = '', added_at: str = '', isrc: str = None,
+                 duration_ms: int = None):
+        self.name = name
+        self.uri = uri
+        # A joined display string (older rows, exported JSON) can only be split on ", "
+        if isinstance(artists, str):
+            artists = artists.split(', ') if artists else ()
+        self._artists = intern_artists(artists)
+        self.added_at = added_at or ''
+        # Identity of the recording across releases and relinks (see track_identity)
+        self.isrc = isrc or None
+        self.duration_ms = duration_ms
+
+    @classmethod
+    def from_item(cls, item: Dict[str, Any]) -> Optional['Track']:
+        """Build a Track from a /me/tracks or playlist item, or None for an empty slot."""
+        track = item.get('track')
+        if not track:
+            return None
+        return cls(track.get('name'), track.get('uri'),
+                   [artist['name'] for artist in track.get('artists', [])], item.get('added_at', ''),
+                   (track.get('external_ids') or {}).get('isrc'), track.get('duration_ms'))
+
+    @classmethod
+    def from_dict(cls, song: Any) -> 'Track':
+        if isinstance(song, cls):
+            return song
+        return cls(song.get('name'), song.get('uri'), song.get('artists', ''), song.get('added_at', ''),
+                   song.get('isrc'), song.get('duration_ms'))
+
+    @property
+    def artists(self) -> str:
+        return ', '.join(self._artists)
+
+    @property
+    def artist_names(self) -> tuple:
+        return self._artists
+
+    def with_added_at(self, added_at: str) -> 'Track':
+        track = Track.__new__(Track)
+        track.name, track.uri, track._artists, track.added_at = self.name, self.uri, self._artists, added_at
+        track.isrc, track.duration_ms = self.isrc, self.duration_ms
+        return track
+
+    def to_dict(self, artist_list: bool = False) -> Dict[str, Any]:
+        """Plain dict of the track; `artists` is the display string unless `artist_list` asks for the names."""
+        return {'name': self.name, 'uri': self.uri,
+                'artists': list(self._artists) if artist_list else self.artists,
+                'added_at': self.added_at, 'isrc': self.isrc, 'duration_ms': self.duration_ms}
+
+    # Read-only mapping access, so code written against track dicts keeps working
+    def __getitem__(self, key: str):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None):
+        return getattr(self, key) if key in self.FIELDS else default
+
+    def keys(self):
+        return self.FIELDS
+
+    def __eq__(self, other):
+        if not isinstance(other, Track):
+            return NotImplemented
+        return (self.uri, self.added_at, self.name, self._artists) == (other.uri, other.added_at, other.name, other._artists)
+
+    def __hash__(self):
+        return hash((self.uri, self.added_at))
+
+    def __repr__(self):
+        return f"Track({self.name!r}, {self.uri!r}, {self.artists!r}, {self.added_at!r})"
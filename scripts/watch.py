@@ -0,0 +1,156 @@
+# scripts/watch.py
+
+"""
+Headless watch mode
+Keeps one or more target playlists in sync with Liked Songs. Each cycle only
+probes for changes (one request for the newest liked song, one per target
+for its snapshot_id); a full diff and write happens only when something
+actually changed.
+"""
+
+import os
+import random
+import time
+from typing import List, Dict, Any
+
+import requests
+
+from .spotify_utils import *
+from .colors import *
+from . import localServer
+from .library_store import LibraryStore, sync_liked_songs
+from .playlist_cache import PlaylistCache
+from .liked_songs_merger import resume_interrupted_write
+from .fanout import load_targets, plan_fanout, write_fanout
+
+# Seconds between cycles, random +/- fraction added to each wait, and the
+# most requests a watcher may send per hour.
+WATCH_INTERVAL = float(os.getenv('SPOTIFY_WATCH_INTERVAL', 300))
+WATCH_JITTER = float(os.getenv('SPOTIFY_WATCH_JITTER', 0.1))
+WATCH_HOURLY_BUDGET = int(os.getenv('SPOTIFY_WATCH_BUDGET', 600))
+
+# While the network is down, waits grow by this factor per failed cycle, up to this many intervals
+WATCH_BACKOFF_FACTOR = 2
+WATCH_MAX_BACKOFF = 8
+
+
+def _log(message: str):
+    print(f"{darkblack}[{time.strftime('%Y-%m-%d %H:%M:%S')}]{clear} {message}", flush=True)
+
+
+def watch_cycle(access_token: str, targets: List[Dict[str, Any]], state: Dict[str, Any],
+                store: LibraryStore, cache: PlaylistCache) -> int:
+    """Run one probe/sync cycle. Returns the number of songs added.
+
+    `targets` are {'playlist_id', 'filter'} entries as in the fan-out
+    config. `state` carries the last seen liked-songs probe and, per
+    target, the snapshot_id the target had after our last sync.
+    """
+    probe = getLikedSongsProbe(access_token)
+    liked_changed = probe != state.get('liked_probe')
+    if liked_changed:
+        sync_liked_songs(access_token, store)
+        state['liked_probe'] = probe
+
+    changed = []
+    for entry in targets:
+        playlist = getPlaylistSnapshot(access_token, entry['playlist_id'])
+        playlist = dict(playlist, filter=entry.get('filter'))
+        resumed = resume_interrupted_write(access_token, playlist, cache)
+        if resumed is False:
+            # Leave the journal alone and try again next cycle
+            continue
+        if isinstance(resumed, str):
+            playlist['snapshot_id'] = resumed
+        if liked_changed or state['snapshots'].get(playlist['id']) != playlist.get('snapshot_id'):
+            changed.append(playlist)
+        else:
+            state['snapshots'][playlist['id']] = playlist.get('snapshot_id')
+
+    if not changed:
+        return 0
+
+    plans = plan_fanout(access_token, changed, store.liked_songs(), cache)
+    results = write_fanout(access_token, plans, cache)
+    added = 0
+    for plan in plans:
+        playlist = plan['playlist']
+        result = results.get(playlist['id'])
+        if result is None:
+            state['snapshots'][playlist['id']] = playlist.get('snapshot_id')
+        elif isinstance(result, str):
+            state['snapshots'][playlist['id']] = result
+            added += len(plan['songs'])
+            _log(f"{darkgreen}OK:{clear} Added {len(plan['songs'])} songs to '{cyan}{playlist['name']}{clear}'")
+        elif result:
+            # Added, but no snapshot returned: re-check next cycle
+            state['snapshots'].pop(playlist['id'], None)
+            added += len(plan['songs'])
+        else:
+            state['snapshots'].pop(playlist['id'], None)
+            _log(f"{red}Failed to add songs to '{playlist['name']}'{clear}")
+    return added
+
+
+def main(config_path: str = None, interval: float = WATCH_INTERVAL, jitter: float = WATCH_JITTER,
+         hourly_budget: int = WATCH_HOURLY_BUDGET, quiet: bool = False, max_cycles: int = None):
+    """Keep the targets in sync until interrupted.
+
+    Targets come from `config_path` (fan-out format) or, without one, the
+    single DEFAULT_PLAYLIST_ID from .env.
+    """
+    if config_path:
+        try:
+            targets = load_targets(config_path)
+        except (OSError, ValueError) as e:
+            print(f"{red}Failed to load targets from '{config_path}': {e}{clear}")
+            return
+    elif os.getenv("DEFAULT_PLAYLIST_ID"):
+        targets = [{'playlist_id': os.getenv("DEFAULT_PLAYLIST_ID")}]
+    else:
+        print(f"{red}No targets: pass a targets file or set DEFAULT_PLAYLIST_ID{clear}")
+        return
+
+    # Only the very first login may be interactive; afterwards the stored
+    # refresh token is used so the watcher can run unattended.
+    localServer.set_quiet(True)
+    if not get_or_refresh_access_token(interactive=True):
+        print(f"{red}Failed to get access token{clear}")
+        return
+
+    scheduler = configure_scheduler(hourly_budget=hourly_budget)
+    store = LibraryStore()
+    cache = PlaylistCache()
+    state = {'liked_probe': None, 'snapshots': {}}
+    _log(f"Watching {len(targets)} playlist(s) every {interval:g}s "
+         f"(jitter {jitter:.0%}, budget {hourly_budget} requests/hour)")
+
+    cycle = 0
+    backoff = 1
+    try:
+        while max_cycles is None or cycle < max_cycles:
+            cycle += 1
+            sent_before = scheduler.sent
+            try:
+                access_token = get_or_refresh_access_token(interactive=False)
+                if not access_token:
+                    _log(f"{red}No valid access token; waiting for next cycle{clear}")
+                else:
+                    added = watch_cycle(access_token, targets, state, store, cache)
+                    if not quiet or added:
+                        _log(f"Cycle {cycle}: {added} songs added, {scheduler.sent - sent_before} requests")
+                backoff = 1
+            except SpotifyAPIError as e:
+                _log(f"{red}{e}{clear}")
+            except requests.RequestException as e:
+                # Offline or the API unreachable: keep running, but poll less often until it's back
+                backoff = min(backoff * WATCH_BACKOFF_FACTOR, WATCH_MAX_BACKOFF)
+                _log(f"{red}Network error: {e}; next try in {backoff}x the interval{clear}")
+            if max_cycles is not None and cycle >= max_cycles:
+                break
+            time.sleep(max(0.0, backoff * interval * (1 + random.uniform(-jitter, jitter))))
+    except KeyboardInterrupt:
+        _log("Stopped watching.")
+    finally:
+        store.close()
+        cache.close()
@@ -0,0 +1,126 @@
+# scripts/write_journal.py
+
+import json
+import os
+from pathlib import Path
+from typing import List, Dict, Optional
+
+from .tracks import Track
+
+# One journal file per playlist with an unfinished batched add.
+JOURNAL_DIR = os.getenv('SPOTIFY_JOURNAL_DIR', str(Path.home() / '.spotify_journal'))
+
+
+class WriteJournal:
+    """On-disk record of a batched add to one playlist.
+
+    Stores the full list of URIs (and optionally the song records) being
+    added, the snapshot_id before the first chunk and the snapshot_id
+    returned for every committed chunk. A chunk is marked in flight before
+    it is posted, so an interrupted run knows which chunk's outcome is
+    uncertain. The file is removed once every chunk is committed.
+    """
+
+    def __init__(self, playlist_id: str, directory: str = JOURNAL_DIR):
+        self.playlist_id = playlist_id
+        self.path = os.path.join(directory, f"{playlist_id}.json")
+        self.data = self._load()
+
+    def _load(self) -> Optional[Dict]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self):
+        # Write to a temp file and rename so a crash never leaves a torn journal
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f)
+        os.replace(tmp, self.path)
+
+    def exists(self) -> bool:
+        return self.data is not None
+
+    def begin(self, uris: List[str], base_snapshot_id: str = None, songs: List[Track] = None, chunk_size: int = 100,
+              position: int = None):
+        """Start a new journal for adding `uris` (at `position`, appended if None), replacing any previous one."""
+        self.data = {
+            'playlist_id': self.playlist_id,
+            'base_snapshot_id': base_snapshot_id,
+            'chunk_size': chunk_size,
+            'position': position,
+            'uris': list(uris),
+            'songs': [Track.from_dict(song).to_dict(artist_list=True) for song in songs] if songs is not None else None,
+            'committed': [],
+            'in_flight': None,
+        }
+        self._save()
+
+    @property
+    def uris(self) -> List[str]:
+        return self.data['uris'] if self.data else []
+
+    @property
+    def songs(self) -> Optional[List[Track]]:
+        songs = self.data.get('songs') if self.data else None
+        return [Track.from_dict(song) for song in songs] if songs is not None else None
+
+    @property
+    def chunk_size(self) -> int:
+        return self.data.get('chunk_size', 100) if self.data else 100
+
+    @property
+    def base_snapshot_id(self) -> Optional[str]:
+        """Snapshot the playlist was at before the first chunk."""
+        return self.data.get('base_snapshot_id') if self.data else None
+
+    @property
+    def position(self) -> Optional[int]:
+        """Where the first URI is inserted, None for an append."""
+        return self.data.get('position') if self.data else None
+
+    @property
+    def committed_chunks(self) -> int:
+        return len(self.data['committed']) if self.data else 0
+
+    @property
+    def total_chunks(self) -> int:
+        return (len(self.uris) + self.chunk_size - 1) // self.chunk_size
+
+    @property
+    def in_flight(self) -> Optional[int]:
+        return self.data.get('in_flight') if self.data else None
+
+    def last_snapshot_id(self) -> Optional[str]:
+        """Snapshot after the last committed chunk (the base snapshot if none)."""
+        if not self.data:
+            return None
+        if self.data['committed']:
+            return self.data['committed'][-1]
+        return self.data.get('base_snapshot_id')
+
+    def mark_in_flight(self, chunk_index: int):
+        self.data['in_flight'] = chunk_index
+        self._save()
+
+    def clear_in_flight(self):
+        """The in-flight chunk was rejected by the API, so it certainly didn't land."""
+        self.data['in_flight'] = None
+        self._save()
+
+    def commit_chunk(self, snapshot_id: str):
+        """Record that the next chunk was added and returned `snapshot_id`."""
+        self.data['committed'].append(snapshot_id)
+        self.data['in_flight'] = None
+        self._save()
+
+    def finish(self):
+        """Remove the journal after every chunk is committed."""
+        self.data = None
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass